@@ -0,0 +1,247 @@
+import argparse
+import glob
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+
+ASSET_CACHE_DIR = '.asset_cache'
+BACKGROUND = 'background.png'
+# Widths of the downscaled background variants; the smallest one at least as wide as the window is shown.
+BACKGROUND_WIDTHS = (640, 800, 1024, 1280, 1600, 1920)
+# Product sprites packed into one atlas, each fitted into the size of the widget showing it.
+PRODUCT_ATLAS = 'products'
+PRODUCT_SPRITES = {
+    'black-glasses': 'blackglasses-removebg-preview (3).png',
+    'nail-art': 'nailback.png',
+}
+SPRITE_SIZE = (300, 400)
+# Longest row of sprites in an atlas page.
+ATLAS_WIDTH = 1024
+# Gap around each sprite, so texture filtering never samples its neighbour.
+ATLAS_PADDING = 2
+
+
+# Function to name derived files after their sources' paths, sizes and mtimes, so edited sources get new ones.
+def source_key(*paths):
+    digest = hashlib.sha1()
+    for path in paths:
+        stat = os.stat(path)
+        digest.update(f'{os.path.abspath(path)}:{stat.st_size}:{stat.st_mtime_ns};'.encode())
+    return digest.hexdigest()[:12]
+
+
+# OpenCV and NumPy are imported inside the functions that decode or encode images, so the launcher can import
+# this module at startup and only pay for them when a variant or atlas actually has to be built.
+
+# Function to read an image as BGRA, or None if it cannot be read.
+def read_bgra(path):
+    import cv2
+    image = cv2.imread(path, cv2.IMREAD_UNCHANGED)
+    if image is None:
+        return None
+    if image.ndim == 2:
+        return cv2.cvtColor(image, cv2.COLOR_GRAY2BGRA)
+    if image.shape[2] == 3:
+        return cv2.cvtColor(image, cv2.COLOR_BGR2BGRA)
+    return image
+
+
+# Function to write an image under a temporary name first, so a running app never reads half a file.
+def write_image(path, image):
+    import cv2
+    temporary_path = path + '.tmp' + os.path.splitext(path)[1]
+    cv2.imwrite(temporary_path, image, [cv2.IMWRITE_JPEG_QUALITY, 90] if path.endswith('.jpg') else [])
+    os.replace(temporary_path, path)
+
+
+# Function to list the files in a directory whose names match a pattern, with their matches.
+def matching_files(directory, pattern):
+    if not os.path.isdir(directory):
+        return []
+    return [(os.path.join(directory, name), match) for name in sorted(os.listdir(directory))
+            for match in [re.fullmatch(pattern, name)] if match]
+
+
+# Function to remove the variants of a background made from older versions of it, and the temporary files
+# a write cut short left behind.
+def remove_stale_variants(name, key, directory=ASSET_CACHE_DIR):
+    pattern = re.escape(name) + r'_([0-9a-f]{12})_(?:w|full)\d+\.(?:jpg|png)(\.tmp\.(?:jpg|png))?'
+    for stale, match in matching_files(directory, pattern):
+        if match.group(1) != key or match.group(2):
+            try:
+                os.remove(stale)
+            except OSError:
+                pass
+
+
+# Function to get the background variant for a window width, creating it on first use. Opaque images are
+# stored as JPEG, which is much smaller and faster to decode than the full-size PNG.
+def background_variant(path, window_width, directory=ASSET_CACHE_DIR):
+    width = next((width for width in BACKGROUND_WIDTHS if width >= window_width), BACKGROUND_WIDTHS[-1])
+    name, key = os.path.splitext(os.path.basename(path))[0], source_key(path)
+    prefix = os.path.join(directory, f'{name}_{key}')
+    # A source narrower than the variant is only re-encoded, once, and named after its own width.
+    for variant, match in matching_files(directory, re.escape(f'{name}_{key}') + r'_full(\d+)\.(?:jpg|png)'):
+        if int(match.group(1)) <= width:
+            return variant
+    for extension in ('jpg', 'png'):
+        variant = f'{prefix}_w{width}.{extension}'
+        if os.path.exists(variant):
+            return variant
+
+    image = read_bgra(path)
+    if image is None:
+        return path
+    import cv2
+    if image.shape[1] > width:
+        height = max(1, round(image.shape[0] * width / image.shape[1]))
+        image = cv2.resize(image, (width, height), interpolation=cv2.INTER_AREA)
+        stem = f'{prefix}_w{width}'
+    else:
+        stem = f'{prefix}_full{image.shape[1]}'
+    opaque = image[:, :, 3].min() == 255
+    variant = f"{stem}.{'jpg' if opaque else 'png'}"
+    os.makedirs(directory, exist_ok=True)
+    write_image(variant, image[:, :, :3] if opaque else image)
+    remove_stale_variants(name, key, directory)
+    return variant
+
+
+# Function to pack sprites into one page in Kivy's .atlas format, each fitted into fit_size, rebuilding only
+# when a source changed. Returns the .atlas path.
+def build_atlas(name, sprites, fit_size=SPRITE_SIZE, directory=ASSET_CACHE_DIR):
+    atlas_path = os.path.join(directory, f'{name}.atlas')
+    page_name = f'{name}-{source_key(*sprites.values())}-{fit_size[0]}x{fit_size[1]}.png'
+    if os.path.exists(atlas_path) and os.path.exists(os.path.join(directory, page_name)):
+        with open(atlas_path) as file:
+            if page_name in json.load(file):
+                return atlas_path
+
+    import cv2
+    import numpy as np
+    images = {}
+    for sprite, path in sprites.items():
+        image = read_bgra(path)
+        if image is None:
+            raise ValueError(f"Sprite '{sprite}' could not be loaded from {path}.")
+        scale = min(fit_size[0] / image.shape[1], fit_size[1] / image.shape[0])
+        if scale < 1:
+            size = (max(1, round(image.shape[1] * scale)), max(1, round(image.shape[0] * scale)))
+            image = cv2.resize(image, size, interpolation=cv2.INTER_AREA)
+        images[sprite] = image
+
+    # Shelf packing, tallest sprites first.
+    padding = ATLAS_PADDING
+    positions = {}
+    x = y = shelf_height = page_width = 0
+    for sprite in sorted(images, key=lambda sprite: -images[sprite].shape[0]):
+        height, width = images[sprite].shape[:2]
+        if x > 0 and x + width + 2 * padding > ATLAS_WIDTH:
+            x, y, shelf_height = 0, y + shelf_height, 0
+        positions[sprite] = (x + padding, y + padding)
+        x += width + 2 * padding
+        shelf_height = max(shelf_height, height + 2 * padding)
+        page_width = max(page_width, x)
+    page_height = y + shelf_height
+
+    page = np.zeros((page_height, page_width, 4), dtype=np.uint8)
+    regions = {}
+    for sprite, (left, top) in positions.items():
+        image = images[sprite]
+        height, width = image.shape[:2]
+        # Repeat the edge pixels one pixel into the padding, so filtering at the border matches the sprite.
+        page[top - 1:top + height + 1, left - 1:left + width + 1] = cv2.copyMakeBorder(
+            image, 1, 1, 1, 1, cv2.BORDER_REPLICATE)
+        # Kivy measures atlas regions from the bottom of the page.
+        regions[sprite] = [left, page_height - top - height, width, height]
+
+    os.makedirs(directory, exist_ok=True)
+    write_image(os.path.join(directory, page_name), page)
+    with open(atlas_path + '.tmp', 'w') as file:
+        json.dump({page_name: regions}, file)
+    os.replace(atlas_path + '.tmp', atlas_path)
+    for old_page in glob.glob(os.path.join(glob.escape(directory), f'{glob.escape(name)}-*.png')):
+        if os.path.basename(old_page) != page_name:
+            os.remove(old_page)
+    return atlas_path
+
+
+# Process-wide cache of decoded assets, so the screens and the try-on share one copy of each image.
+# bgra() may be called from any thread; the texture methods only from the Kivy main thread.
+class AssetCache:
+    def __init__(self, directory=ASSET_CACHE_DIR):
+        self.directory = directory
+        self.lock = threading.Lock()
+        self.images = {}
+        self.textures = {}
+        self.backgrounds = {}
+        self.atlases = {}
+
+    # Function to get an image as BGRA pixels for OpenCV compositing, or None if it cannot be read.
+    def bgra(self, path):
+        with self.lock:
+            if path not in self.images:
+                self.images[path] = read_bgra(path)
+            return self.images[path]
+
+    def texture(self, path):
+        texture = self.textures.get(path)
+        if texture is None:
+            # Imported here so the try-on can use this module off the UI thread, without Kivy.
+            from kivy.core.image import Image as CoreImage
+            texture = self.textures[path] = CoreImage(path).texture
+        return texture
+
+    # Function to get the background texture for a window size. When the window grows past the current
+    # variant, the larger one replaces it in the cache.
+    def background(self, window_size, path=BACKGROUND):
+        width = next((width for width in BACKGROUND_WIDTHS if width >= window_size[0]), BACKGROUND_WIDTHS[-1])
+        current = self.backgrounds.get(path)
+        if current is None or current[0] != width:
+            variant = background_variant(path, width, self.directory)
+            if current is not None and current[1] != variant:
+                self.textures.pop(current[1], None)
+            current = self.backgrounds[path] = (width, variant)
+        return self.texture(current[1])
+
+    # Function to get a sprite's texture, a region of its atlas page, building the atlas on first use.
+    def sprite(self, name, atlas=PRODUCT_ATLAS, sprites=PRODUCT_SPRITES):
+        if atlas not in self.atlases:
+            from kivy.atlas import Atlas
+            self.atlases[atlas] = Atlas(build_atlas(atlas, sprites, directory=self.directory))
+        return self.atlases[atlas][name]
+
+
+assets = None
+assets_lock = threading.Lock()
+
+# Function to get the process-wide asset cache.
+def get_assets():
+    global assets
+    with assets_lock:
+        if assets is None:
+            assets = AssetCache()
+    return assets
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Precompute the background variants and the product sprite atlas.')
+    parser.add_argument('--directory', default=ASSET_CACHE_DIR)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    for width in BACKGROUND_WIDTHS:
+        variant = background_variant(BACKGROUND, width, args.directory)
+        print(f'{variant}: {os.path.getsize(variant) // 1024} KB')
+    atlas_path = build_atlas(PRODUCT_ATLAS, PRODUCT_SPRITES, directory=args.directory)
+    with open(atlas_path) as file:
+        for page_name, regions in json.load(file).items():
+            print(f'{page_name}: ' + ', '.join(f'{sprite} {w}x{h}' for sprite, (x, y, w, h) in regions.items()))
+    print(f'done in {(time.perf_counter() - start) * 1000:.0f} ms')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,69 @@
+import threading
+
+from kivy.clock import Clock
+
+
+class JobCancelled(Exception):
+    pass
+
+
+# Runs work(job) on a worker thread so the Kivy UI keeps responding. Progress, the result and any error
+# are posted back to the main thread with Clock.schedule_once; a cancelled job never delivers its result.
+class BackgroundJob:
+    def __init__(self, work, on_done, on_error=None, on_progress=None, on_finished=None, name='background-job'):
+        self.work = work
+        self.on_done = on_done
+        self.on_error = on_error
+        self.on_progress = on_progress
+        self.on_finished = on_finished
+        self.cancel_event = threading.Event()
+        self.finished = False
+        self.thread = threading.Thread(target=self.run, name=name, daemon=True)
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def cancel(self):
+        self.cancel_event.set()
+
+    @property
+    def cancelled(self):
+        return self.cancel_event.is_set()
+
+    @property
+    def running(self):
+        return not self.finished
+
+    # Called by the work function between steps; stops it with JobCancelled once cancel() was called.
+    def check(self):
+        if self.cancel_event.is_set():
+            raise JobCancelled()
+
+    # Progress callback for the work function, fraction between 0 and 1. Also a cancellation point.
+    def progress(self, fraction):
+        self.check()
+        if self.on_progress is not None:
+            Clock.schedule_once(lambda dt: self.deliver(self.on_progress, fraction))
+
+    def run(self):
+        try:
+            result = self.work(self)
+        except JobCancelled:
+            pass
+        except Exception as e:
+            if self.on_error is not None:
+                Clock.schedule_once(lambda dt, error=e: self.deliver(self.on_error, error))
+        else:
+            Clock.schedule_once(lambda dt: self.deliver(self.on_done, result))
+        Clock.schedule_once(lambda dt: self.finish())
+
+    # Runs on the main thread, so a cancel() issued there always wins over a result still in the Clock queue.
+    def deliver(self, callback, value):
+        if not self.cancelled:
+            callback(value)
+
+    def finish(self):
+        self.finished = True
+        if self.on_finished is not None:
+            self.on_finished(self)
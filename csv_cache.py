@@ -0,0 +1,122 @@
+import hashlib
+import json
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+
+CACHE_DIR = '.csv_cache'
+# Bumped when the stored layout changes, so older caches are rebuilt. 2: category codes in pandas' own dtype.
+CACHE_VERSION = 2
+
+
+# Function to get the cache directory of a CSV file, keyed by its absolute path.
+def cache_dir(path):
+    return os.path.join(CACHE_DIR, hashlib.sha1(os.path.abspath(path).encode()).hexdigest())
+
+
+# Function to read the manifest of a cached file, dropping the cache if the file changed since.
+def read_manifest(path):
+    stat = os.stat(path)
+    directory = cache_dir(path)
+    manifest_path = os.path.join(directory, 'manifest.json')
+    if os.path.exists(manifest_path):
+        with open(manifest_path) as file:
+            manifest = json.load(file)
+        if (manifest.get('version') == CACHE_VERSION and manifest['size'] == stat.st_size
+                and manifest['mtime_ns'] == stat.st_mtime_ns):
+            return manifest
+        shutil.rmtree(directory, ignore_errors=True)
+    return {'version': CACHE_VERSION, 'path': os.path.abspath(path), 'size': stat.st_size,
+            'mtime_ns': stat.st_mtime_ns, 'columns': {}}
+
+
+def write_manifest(path, manifest):
+    manifest_path = os.path.join(cache_dir(path), 'manifest.json')
+    with open(manifest_path + '.tmp', 'w') as file:
+        json.dump(manifest, file)
+    os.replace(manifest_path + '.tmp', manifest_path)
+
+
+# Function to list the columns of a CSV file without parsing its rows.
+def csv_columns(path):
+    return list(pd.read_csv(path, nrows=0).columns)
+
+
+# Function to parse only the given columns, streaming the file in chunks.
+def parse_columns(path, columns, chunksize=250_000, progress=None):
+    size = max(os.path.getsize(path), 1)
+    parts = {column: [] for column in columns}
+    with open(path, 'rb') as file:
+        for chunk in pd.read_csv(file, usecols=columns, chunksize=chunksize):
+            for column in columns:
+                parts[column].append(chunk[column])
+            if progress is not None:
+                progress(min(file.tell() / size, 1.0))
+    return {column: pd.concat(chunks, ignore_index=True) if chunks else pd.Series([], dtype=object)
+            for column, chunks in parts.items()}
+
+
+# Function to get the dtype pandas keeps category codes in for this many categories. Codes stored in it are
+# used as they are, so a loaded categorical stays memory-mapped.
+def codes_dtype(category_count):
+    for dtype in (np.int8, np.int16, np.int32):
+        if category_count < np.iinfo(dtype).max:
+            return dtype
+    return np.int64
+
+
+# Function to store one column as .npy files: numeric columns as is, text as category codes plus categories.
+def store_column(directory, column, series):
+    name = hashlib.sha1(column.encode()).hexdigest()[:16]
+    if pd.api.types.is_numeric_dtype(series.dtype) or pd.api.types.is_bool_dtype(series.dtype):
+        np.save(os.path.join(directory, f'{name}.npy'), series.to_numpy())
+        return {'file': f'{name}.npy', 'kind': 'values'}
+    codes, categories = pd.factorize(series)
+    np.save(os.path.join(directory, f'{name}.npy'), codes.astype(codes_dtype(len(categories))))
+    np.save(os.path.join(directory, f'{name}.categories.npy'), np.asarray(categories, dtype=str))
+    return {'file': f'{name}.npy', 'categories': f'{name}.categories.npy', 'kind': 'categorical'}
+
+
+# Function to open a cached column, memory-mapped where possible.
+def open_column(directory, entry):
+    values = np.load(os.path.join(directory, entry['file']), mmap_mode='r')
+    if entry['kind'] == 'categorical':
+        categories = np.load(os.path.join(directory, entry['categories']))
+        return pd.Categorical.from_codes(values, categories)
+    return values
+
+
+# Function to get the arrays holding a column's data, the codes for a categorical.
+def column_data(column):
+    return column.codes if isinstance(column, pd.Categorical) else column
+
+
+# Function to load columns of a CSV file. The first load parses only the requested columns and caches
+# them in binary form keyed by path, size and mtime; later loads memory-map the cached columns.
+def load_columns(path, columns=None, chunksize=250_000, progress=None):
+    header = csv_columns(path)
+    columns = header if not columns else list(dict.fromkeys(columns))
+    missing = [column for column in columns if column not in header]
+    if missing:
+        raise ValueError(f"Column(s) not found in {os.path.basename(path)}: {', '.join(missing)}")
+
+    manifest = read_manifest(path)
+    directory = cache_dir(path)
+    uncached = [column for column in columns if column not in manifest['columns']]
+    if uncached:
+        os.makedirs(directory, exist_ok=True)
+        for column, series in parse_columns(path, uncached, chunksize, progress).items():
+            manifest['columns'][column] = store_column(directory, column, series)
+        write_manifest(path, manifest)
+    if progress is not None:
+        progress(1.0)
+
+    opened = {column: open_column(directory, manifest['columns'][column]) for column in columns}
+    # copy=False keeps the frame on the memory-mapped files instead of reading every column into RAM.
+    frame = pd.DataFrame(opened, columns=columns, copy=False)
+    for column in columns:
+        if not np.may_share_memory(column_data(frame[column].array), column_data(opened[column])):
+            print(f"CSV cache: column '{column}' of {os.path.basename(path)} was copied into memory.")
+    return frame
@@ -0,0 +1,144 @@
+from kivy.clock import Clock
+from kivy.uix.boxlayout import BoxLayout
+from kivy.uix.button import Button
+from kivy.uix.label import Label
+from kivy.uix.recycleboxlayout import RecycleBoxLayout
+from kivy.uix.recycleview import RecycleView
+from kivy.uix.textinput import TextInput
+
+# Rows formatted at a time; scrolling past either end of a page slides it by half a page.
+PAGE_ROWS = 400
+ROW_HEIGHT = 24
+MAX_CELL_WIDTH = 30
+
+
+# One table row as a single monospaced label, so a row costs one widget however many columns it has.
+class TableRow(Label):
+    def __init__(self, **kwargs):
+        kwargs.setdefault('font_name', 'RobotoMono-Regular')
+        kwargs.setdefault('font_size', 13)
+        super().__init__(halign='left', valign='middle', shorten=True, **kwargs)
+        self.bind(size=self.update_text_size)
+
+    def update_text_size(self, instance, size):
+        self.text_size = size
+
+
+# Function to format rows [start, stop) of the given columns as fixed-width text lines, with a header line.
+def format_rows(data, columns, start, stop):
+    page = data.iloc[start:stop]
+    cells = [[str(row) for row in range(start, stop)]]
+    names = ['']
+    for column in columns:
+        cells.append([text[:MAX_CELL_WIDTH] for text in page[column].astype(str)])
+        names.append(str(column)[:MAX_CELL_WIDTH])
+    widths = [max([len(name)] + [len(text) for text in column_cells]) for name, column_cells in zip(names, cells)]
+    header = '  '.join(name.ljust(width) for name, width in zip(names, widths))
+    lines = ['  '.join(text.ljust(width) for text, width in zip(row, widths)) for row in zip(*cells)]
+    return header, lines
+
+
+# Virtualized view of a DataFrame. Only a page of rows is ever formatted and the RecycleView only creates
+# widgets for the rows on screen, so memory and render time follow the viewport, not the file.
+class DataTable(BoxLayout):
+    def __init__(self, page_rows=PAGE_ROWS, **kwargs):
+        super().__init__(orientation='vertical', spacing=5, **kwargs)
+        self.page_rows = page_rows
+        self.data = None
+        self.columns = []
+        self.start = 0
+        self.stop = 0
+        self.paging = False
+
+        controls = BoxLayout(size_hint_y=None, height=40, spacing=5)
+        self.column_input = TextInput(hint_text='Columns (comma separated, empty for all)', multiline=False)
+        self.column_input.bind(on_text_validate=self.project_columns)
+        controls.add_widget(self.column_input)
+
+        self.row_input = TextInput(hint_text='Go to row', multiline=False, input_filter='int', size_hint_x=0.3)
+        self.row_input.bind(on_text_validate=self.jump_to_row)
+        controls.add_widget(self.row_input)
+
+        self.previous_button = Button(text='<', size_hint_x=None, width=50)
+        self.previous_button.bind(on_press=lambda instance: self.show(self.start - self.page_rows))
+        controls.add_widget(self.previous_button)
+
+        self.next_button = Button(text='>', size_hint_x=None, width=50)
+        self.next_button.bind(on_press=lambda instance: self.show(self.start + self.page_rows))
+        controls.add_widget(self.next_button)
+
+        self.status = Label(text='', size_hint_x=0.6)
+        controls.add_widget(self.status)
+        self.add_widget(controls)
+
+        self.header = TableRow(size_hint_y=None, height=ROW_HEIGHT, bold=True)
+        self.add_widget(self.header)
+
+        self.view = RecycleView(viewclass=TableRow)
+        layout = RecycleBoxLayout(orientation='vertical', default_size=(None, ROW_HEIGHT),
+                                  default_size_hint=(1, None), size_hint_y=None)
+        layout.bind(minimum_height=layout.setter('height'))
+        self.view.add_widget(layout)
+        self.view.bind(scroll_y=self.on_scroll)
+        self.add_widget(self.view)
+
+    @property
+    def row_count(self):
+        return 0 if self.data is None else len(self.data)
+
+    def set_data(self, data):
+        self.data = data
+        self.columns = list(data.columns)
+        self.column_input.text = ''
+        self.show(0)
+
+    # Function to show the page containing `row`, scrolled so that row is at the top of the view.
+    def show(self, row, top_row=None):
+        if self.data is None:
+            return
+        row = max(0, min(row, self.row_count - 1))
+        self.start = max(0, min(row, self.row_count - self.page_rows))
+        self.stop = min(self.start + self.page_rows, self.row_count)
+
+        header, lines = format_rows(self.data, self.columns, self.start, self.stop)
+        self.header.text = header
+        self.paging = True
+        self.view.data = [{'text': line} for line in lines]
+        self.status.text = f'rows {self.start}-{max(self.stop - 1, 0)} of {self.row_count}'
+        # The layout only takes its new height on the next frame, so scroll once it has.
+        Clock.schedule_once(lambda dt: self.scroll_to(row if top_row is None else top_row))
+
+    def scroll_to(self, row):
+        scrollable = (self.stop - self.start) * ROW_HEIGHT - self.view.height
+        if scrollable > 0:
+            offset = (row - self.start) * ROW_HEIGHT
+            self.view.scroll_y = min(max(1 - offset / scrollable, 0.0), 1.0)
+        self.paging = False
+
+    # Slide the page by half its size when the view is scrolled to either end, keeping the same rows on screen.
+    def on_scroll(self, instance, scroll_y):
+        if self.paging or self.data is None:
+            return
+        visible_rows = int(self.view.height // ROW_HEIGHT)
+        if scroll_y <= 0 and self.stop < self.row_count:
+            self.show(self.start + self.page_rows // 2, top_row=self.stop - visible_rows)
+        elif scroll_y >= 1 and self.start > 0:
+            self.show(self.start - self.page_rows // 2, top_row=self.start)
+
+    def jump_to_row(self, instance):
+        if instance.text:
+            row = int(instance.text)
+            # Start the page a little before the row so scrolling up does not immediately page back.
+            self.show(row - self.page_rows // 4, top_row=row)
+
+    # Function to limit the table to the comma separated columns typed in, or all columns if empty.
+    def project_columns(self, instance):
+        if self.data is None:
+            return
+        names = [name.strip() for name in instance.text.split(',') if name.strip()]
+        missing = [name for name in names if name not in self.data.columns]
+        if missing:
+            self.status.text = f"Unknown column(s): {', '.join(missing)}"
+            return
+        self.columns = names or list(self.data.columns)
+        self.show(self.start)
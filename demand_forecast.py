@@ -0,0 +1,151 @@
+import argparse
+
+import numpy as np
+import pandas as pd
+
+from csv_cache import load_columns
+
+
+# Daily sales of many SKUs as one (n_sku, n_days) matrix. Days before a SKU's first sale are NaN,
+# days without sales after that are 0.
+class SalesMatrix:
+    def __init__(self, skus, start_date, values):
+        self.skus = skus
+        self.start_date = start_date
+        self.values = values
+
+    @property
+    def dates(self):
+        return pd.date_range(self.start_date, periods=self.values.shape[1], freq='D')
+
+
+# Function to build the sales matrix from a long-format CSV with one row per sku, date and quantity.
+def load_sales(path, sku_column='sku', date_column='date', quantity_column='quantity'):
+    data = load_columns(path, [sku_column, date_column, quantity_column])
+    sku_codes, skus = pd.factorize(data[sku_column])
+
+    # Parse each distinct date once, then map rows onto day numbers.
+    date_codes, date_values = pd.factorize(data[date_column])
+    dates = pd.to_datetime(pd.Index(date_values))
+    start_date = dates.min()
+    day_of_code = (dates - start_date).days.to_numpy()
+    days = day_of_code[date_codes]
+    n_sku, n_days = len(skus), int(day_of_code.max()) + 1
+
+    quantity = pd.to_numeric(data[quantity_column], errors='coerce').fillna(0).to_numpy(dtype=np.float64)
+    flat = sku_codes.astype(np.int64) * n_days + days
+    values = np.bincount(flat, weights=quantity, minlength=n_sku * n_days).reshape(n_sku, n_days)
+
+    first_day = np.full(n_sku, n_days, dtype=np.int64)
+    np.minimum.at(first_day, sku_codes, days)
+    values[np.arange(n_days)[None, :] < first_day[:, None]] = np.nan
+    return SalesMatrix(np.asarray(skus), start_date, values.astype(np.float32))
+
+
+# Function to forecast the mean of the last `window` observed days.
+def moving_average(values, horizon, window=7):
+    recent = values[:, -window:]
+    observed = (~np.isnan(recent)).sum(axis=1)
+    mean = np.where(observed > 0, np.nansum(recent, axis=1) / np.maximum(observed, 1), 0.0)
+    return np.repeat(mean[:, None], horizon, axis=1)
+
+
+# Function to repeat the last observed season.
+def seasonal_naive(values, horizon, season=7):
+    last_season = np.nan_to_num(values[:, -season:])
+    repeats = -(-horizon // season)
+    return np.tile(last_season, (1, repeats))[:, :horizon]
+
+
+# Function to run Holt-Winters additive smoothing over every SKU at once, one day per step.
+# Without a season this is Holt's linear trend method, and with beta=0 simple exponential smoothing.
+def smoothing_states(values, alpha, beta, gamma, season):
+    n_sku, n_days = values.shape
+    # Day-major, so each step reads one contiguous row instead of a strided column.
+    days = np.ascontiguousarray(values.T, dtype=np.float64)
+    level = np.full(n_sku, np.nan)
+    trend = np.zeros(n_sku)
+    seasonal = np.zeros((max(season, 1), n_sku))
+    for t in range(n_days):
+        x = days[t]
+        observed = ~np.isnan(x)
+        s = seasonal[t % season] if season else 0.0
+
+        # A SKU's state starts at its first observed day; until then it is left untouched.
+        starting = observed & np.isnan(level)
+        level[starting] = x[starting]
+        updating = observed & ~starting
+
+        new_level = alpha * (x - s) + (1 - alpha) * (level + trend)
+        trend = np.where(updating, beta * (new_level - level) + (1 - beta) * trend, trend)
+        if season:
+            seasonal[t % season] = np.where(updating, gamma * (x - new_level) + (1 - gamma) * s, s)
+        level = np.where(updating, new_level, level)
+    return np.nan_to_num(level), trend, seasonal.T
+
+
+def exponential_smoothing(values, horizon, alpha=0.3, beta=0.1):
+    level, trend, _ = smoothing_states(values, alpha, beta, 0.0, 0)
+    steps = np.arange(1, horizon + 1)
+    return level[:, None] + trend[:, None] * steps[None, :]
+
+
+def holt_winters(values, horizon, alpha=0.3, beta=0.05, gamma=0.2, season=7):
+    level, trend, seasonal = smoothing_states(values, alpha, beta, gamma, season)
+    steps = np.arange(1, horizon + 1)
+    season_index = (values.shape[1] - 1 + steps) % season
+    return level[:, None] + trend[:, None] * steps[None, :] + seasonal[:, season_index]
+
+
+MODELS = {
+    'moving_average': moving_average,
+    'exponential_smoothing': exponential_smoothing,
+    'holt_winters': holt_winters,
+    'seasonal_naive': seasonal_naive,
+}
+
+# Models that step through every day run over blocks of SKUs, so the per-day state stays in cache.
+SEQUENTIAL_MODELS = ('exponential_smoothing', 'holt_winters')
+
+
+# Function to forecast `horizon` days for every row of a sales matrix. Returns a float32 (n_sku, horizon) array.
+def forecast(values, model='holt_winters', horizon=28, chunk_size=16_384, **params):
+    if model not in MODELS:
+        raise ValueError(f"Unknown model '{model}', expected one of {', '.join(MODELS)}.")
+    values = np.asarray(values, dtype=np.float32)
+    if values.ndim == 1:
+        values = values[None, :]
+
+    if model in SEQUENTIAL_MODELS and len(values) > chunk_size:
+        result = np.concatenate([MODELS[model](values[start:start + chunk_size], horizon, **params)
+                                 for start in range(0, len(values), chunk_size)])
+    else:
+        result = MODELS[model](values, horizon, **params)
+    return np.maximum(result, 0).astype(np.float32)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Forecast daily demand for every SKU in a long-format sales CSV.')
+    parser.add_argument('input', help='CSV with one row per sku, date and quantity.')
+    parser.add_argument('--model', choices=list(MODELS), default='holt_winters')
+    parser.add_argument('--horizon', type=int, default=28, help='Days to forecast.')
+    parser.add_argument('--sku-column', default='sku')
+    parser.add_argument('--date-column', default='date')
+    parser.add_argument('--quantity-column', default='quantity')
+    parser.add_argument('--output', default='forecast.csv', help='Long-format CSV to write the forecast to.')
+    args = parser.parse_args()
+
+    sales = load_sales(args.input, args.sku_column, args.date_column, args.quantity_column)
+    predicted = forecast(sales.values, args.model, args.horizon)
+
+    future = pd.date_range(sales.dates[-1] + pd.Timedelta(days=1), periods=args.horizon, freq='D')
+    pd.DataFrame({
+        args.sku_column: np.repeat(sales.skus, args.horizon),
+        args.date_column: np.tile(future.strftime('%Y-%m-%d'), len(sales.skus)),
+        args.quantity_column: predicted.ravel(),
+    }).to_csv(args.output, index=False)
+    print(f"Forecast {len(sales.skus)} SKUs x {args.horizon} days with {args.model} -> {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -7,13 +7,183 @@ from kivy.uix.filechooser import FileChooserListView
 from kivy.uix.textinput import TextInput
 from kivy.uix.spinner import Spinner
 from kivy.uix.popup import Popup
+from kivy.uix.progressbar import ProgressBar
+import numpy as np
 import pandas as pd
 from matplotlib import pyplot as plt
 from matplotlib.animation import FuncAnimation
+from matplotlib.collections import PolyCollection
+from matplotlib.ticker import FuncFormatter, MaxNLocator
 from itertools import count
+from collections import OrderedDict
+import copy
+import os
+
+from background_jobs import BackgroundJob
+from csv_cache import load_columns
+from data_table import DataTable
+from demand_forecast import MODELS, forecast
+from series_lod import LOD_MODES, LodPyramid
+
+# Upper bound on animation frames; longer columns advance several rows per frame.
+MAX_ANIMATION_FRAMES = 2000
+
+# Number of x steps forecast past the end of the series when a forecast overlay is selected.
+FORECAST_HORIZON = 28
+NO_FORECAST = 'No Forecast'
+
+# Aggregations of y per x category in bar and pie mode.
+AGGREGATIONS = ('sum', 'mean', 'count')
+HISTOGRAM_BINS = 20
+# Per-frame aggregate tables larger than this keep only every few frames.
+MAX_TABLE_CELLS = 4_000_000
+# Prepared series (with their aggregates) kept for redisplaying the same selection.
+MAX_CACHED_SERIES = 4
+
+
+# Numeric arrays behind one plot. Built on a background job, so it never touches widgets or figures.
+class PlotSeries:
+    def __init__(self, data, x_column, y_column, lod_mode='lttb', forecast_model=NO_FORECAST):
+        self.x_column = x_column
+        self.y_column = y_column
+
+        # Text x values are plotted at their category positions.
+        self.x_data = data[x_column]
+        self.y_data = data[y_column]
+        if pd.api.types.is_numeric_dtype(self.x_data.dtype):
+            self.x_positions = self.x_data.to_numpy(dtype=float)
+            self.x_labels = None
+        else:
+            codes, self.x_labels = pd.factorize(self.x_data)
+            self.x_positions = codes.astype(float)
+        self.y_values = pd.to_numeric(self.y_data, errors='coerce').to_numpy(dtype=float)
+
+        # Multi-resolution pyramid so each frame draws a screen-sized subset of the rows.
+        self.lod = LodPyramid(self.x_positions, self.y_values, lod_mode)
+        self.x_increasing = bool(np.all(np.diff(self.x_positions) >= 0))
+
+        # Long columns are shown in at most MAX_ANIMATION_FRAMES steps of several rows each.
+        rows = len(data)
+        if rows <= MAX_ANIMATION_FRAMES:
+            self.frame_stops = np.arange(rows)
+        else:
+            self.frame_stops = np.linspace(0, rows, MAX_ANIMATION_FRAMES).astype(int)
+
+        self.forecast_model = forecast_model
+
+        # Per-frame aggregate tables and forecasts, computed on first use and kept with the series.
+        self.aggregates = {}
+
+    # Function to copy the series for a job to extend with more aggregates. The arrays are never modified
+    # and are shared; the aggregates dict is not, since the plot on screen may be reading the original's.
+    def copy(self):
+        series = copy.copy(self)
+        series.aggregates = dict(self.aggregates)
+        return series
+
+    # Function to count, for every animation frame, the rows shown so far in each group (weighted if given).
+    # Rows in group -1 are skipped. Returns (table, stride): frame i reads row (i + 1) // stride - 1 of the table.
+    def cumulative_table(self, groups, group_count, weights=None):
+        frames = len(self.frame_stops)
+        stride = max(1, -(-frames * group_count // MAX_TABLE_CELLS))
+        checkpoints = frames // stride
+
+        # Row r is first shown in the frame whose stop passes it.
+        row_frames = np.searchsorted(self.frame_stops, np.arange(len(groups)), side='right')
+        blocks = row_frames // stride
+        keep = (groups >= 0) & (blocks < checkpoints)
+        flat = blocks[keep] * group_count + groups[keep]
+        table = np.bincount(flat, weights=None if weights is None else weights[keep],
+                            minlength=checkpoints * group_count)
+        return np.cumsum(table.reshape(checkpoints, group_count), axis=0), stride
+
+    # Function to look up frame i of a cumulative table; frames before the first checkpoint are all zero.
+    def table_frame(self, key, i):
+        table, stride = self.aggregates[key]
+        checkpoint = (i + 1) // stride - 1
+        return table[checkpoint] if checkpoint >= 0 else np.zeros(table.shape[1])
+
+    # Function to group y by x category with a single bincount per frame table: sum, mean or count.
+    def group_by(self, how):
+        key = ('group', how)
+        if key not in self.aggregates:
+            known = np.isfinite(self.y_values)
+            groups = np.where(known, self.x_positions, -1).astype(np.int64)
+            group_count = len(self.x_labels)
+            if how == 'count':
+                self.aggregates[key] = self.cumulative_table(groups, group_count)
+            else:
+                sums, stride = self.cumulative_table(groups, group_count, np.where(known, self.y_values, 0.0))
+                if how == 'mean':
+                    counts = self.cumulative_table(groups, group_count)[0]
+                    sums = np.divide(sums, counts, out=np.zeros_like(sums), where=counts > 0)
+                self.aggregates[key] = sums, stride
+        return key
+
+    # Function to bin y into fixed edges over the whole column, with cumulative counts per frame.
+    def histogram(self):
+        key = ('histogram', HISTOGRAM_BINS)
+        if key not in self.aggregates:
+            finite = np.isfinite(self.y_values)
+            self.bin_edges = np.histogram_bin_edges(self.y_values[finite], bins=HISTOGRAM_BINS)
+            # Same bins as np.histogram: half-open, except that the last one includes its right edge.
+            bins = np.searchsorted(self.bin_edges, self.y_values, side='right') - 1
+            bins[self.y_values == self.bin_edges[-1]] = HISTOGRAM_BINS - 1
+            bins[~finite | (bins < 0) | (bins >= HISTOGRAM_BINS)] = -1
+            self.aggregates[key] = self.cumulative_table(bins, HISTOGRAM_BINS)
+        return key
+
+    # Function to compute the aggregates a plot type needs, so the figure only does lookups.
+    def prepare(self, plot_type, aggregation):
+        if plot_type == 'histogram':
+            self.histogram()
+        elif plot_type in ('bar', 'pie') and self.x_labels is not None:
+            self.group_by(aggregation)
+        if plot_type in ('line', 'bar'):
+            self.forecast_line(aggregation if plot_type == 'bar' and self.x_labels is not None else None)
+
+    # Function to tell whether x is an axis a forecast can continue: numeric, or text holding ISO dates that
+    # appear in order. Other text is plotted in order of first appearance, which is not a time axis.
+    def x_is_temporal(self):
+        if self.x_labels is None:
+            return True
+        dates = pd.to_datetime(pd.Index(self.x_labels), errors='coerce', format='ISO8601')
+        return not dates.isna().any() and dates.is_monotonic_increasing
+
+    # Function to forecast what is plotted per distinct x: the category aggregate for grouped bars, otherwise
+    # the mean y of each x. Returns (x, y, step) continuing the series from its last point, or None.
+    def forecast_line(self, aggregation=None):
+        key = ('forecast', aggregation)
+        if key in self.aggregates:
+            return self.aggregates[key]
+        self.aggregates[key] = None
+        if self.forecast_model != NO_FORECAST and not self.x_is_temporal():
+            print(f"No forecast: '{self.x_column}' is not a numeric or date column.")
+            return None
+        if aggregation is not None:
+            values = self.aggregates[self.group_by(aggregation)][0][-1]
+            positions = np.arange(len(values), dtype=float)
+        else:
+            known = np.isfinite(self.x_positions) & np.isfinite(self.y_values)
+            positions, inverse = np.unique(self.x_positions[known], return_inverse=True)
+            values = np.bincount(inverse, weights=self.y_values[known]) / np.bincount(inverse) if len(positions) else []
+        if self.forecast_model == NO_FORECAST or len(positions) < 2:
+            return None
+
+        predicted = forecast(values, self.forecast_model, FORECAST_HORIZON)[0]
+        step = np.median(np.diff(positions))
+        line = (positions[-1] + step * np.arange(FORECAST_HORIZON + 1), np.concatenate([[values[-1]], predicted]), step)
+        self.aggregates[key] = line
+        return line
+
 
 class CSVViewerApp(App):
     def build(self):
+        self.job = None
+        self.job_button = None
+        self.series = None
+        self.series_cache = OrderedDict()
+
         self.layout = BoxLayout(orientation='vertical', spacing=10)
 
         self.file_chooser = FileChooserListView()
@@ -50,6 +220,15 @@ class CSVViewerApp(App):
         self.spinner = Spinner(text='Select Plot Type', values=['line', 'bar', 'pie', 'histogram'])
         self.graph_tab_content.add_widget(self.spinner)
 
+        self.lod_spinner = Spinner(text='lttb', values=LOD_MODES)
+        self.graph_tab_content.add_widget(self.lod_spinner)
+
+        self.forecast_spinner = Spinner(text=NO_FORECAST, values=[NO_FORECAST] + list(MODELS))
+        self.graph_tab_content.add_widget(self.forecast_spinner)
+
+        self.aggregation_spinner = Spinner(text='sum', values=AGGREGATIONS)
+        self.graph_tab_content.add_widget(self.aggregation_spinner)
+
         self.tabs.add_widget(self.graph_tab)
         self.graph_tab.content = self.graph_tab_content
 
@@ -57,77 +236,285 @@ class CSVViewerApp(App):
         self.display_button.bind(on_press=self.display_graph)
         self.layout.add_widget(self.display_button)
 
-        self.csv_label = Label(text='', size_hint=(1, None))
+        self.progress_bar = ProgressBar(max=1, value=0, size_hint_y=None, height=20)
+        self.layout.add_widget(self.progress_bar)
+
+        self.csv_label = Label(text='', size_hint=(1, None), height=30)
         self.layout.add_widget(self.csv_label)
 
+        self.table = DataTable()
+        self.layout.add_widget(self.table)
+
         return self.layout
 
+    # Start a background job for a button. While it runs the button reads 'Cancel', and pressing either
+    # button cancels it instead of starting a second parse of the same file.
+    def start_job(self, button, work, on_done):
+        self.job_button = button
+        self.job_text = button.text
+        button.text = 'Cancel'
+        self.progress_bar.value = 0
+        self.job = BackgroundJob(work, on_done, on_error=lambda e: self.show_error_popup(f"Error: {e}"),
+                                 on_progress=self.set_progress, on_finished=self.job_finished).start()
+
+    # Function to cancel the running job, if any. Returns True if a job was cancelled.
+    def cancel_job(self):
+        if self.job is None or not self.job.running:
+            return False
+        self.job.cancel()
+        self.csv_label.text = 'Cancelled.'
+        self.job_finished(self.job)
+        return True
+
+    def job_finished(self, job):
+        if job is not self.job:
+            return
+        self.job = None
+        self.job_button.text = self.job_text
+        self.progress_bar.value = 0
+
+    def set_progress(self, fraction):
+        self.progress_bar.value = fraction
+
     def animate(self, i, plot_type):
-        plt.cla()
+        # Pie charts cannot be updated in place, so they are still redrawn from scratch.
+        if plot_type == 'pie':
+            plt.cla()
+            self.plot_pie(i)
+            return []
 
         plotting_functions = {
             'line': self.plot_line,
             'bar': self.plot_bar,
-            'pie': self.plot_pie,
             'histogram': self.plot_histogram
         }
 
-        plotting_functions[plot_type](i)
+        return plotting_functions[plot_type](i)
+
+    # Create the artists of a plot type once; each animation frame then only updates them.
+    def init_plot(self, ax, plot_type):
+        initializers = {
+            'line': self.init_line,
+            'bar': self.init_bar,
+            'histogram': self.init_histogram
+        }
+
+        # Draw at most about two points per horizontal pixel of the axes.
+        self.max_points = max(int(ax.get_window_extent().width) * 2, 200)
+        self.plot_type = plot_type
+        self.current_frame = 0
+        self.zoom_range = None
+
+        if plot_type in initializers:
+            initializers[plot_type](ax)
+            if plot_type in ('line', 'bar'):
+                grouped = plot_type == 'bar' and self.series.x_labels is not None
+                line = self.series.forecast_line(self.aggregation if grouped else None)
+                if line is not None:
+                    self.init_forecast(ax, *line)
+            self.full_range = ax.get_xlim()
+            if plot_type != 'histogram':
+                ax.callbacks.connect('xlim_changed', self.on_zoom)
+            if self.series.x_labels is not None and plot_type != 'histogram':
+                ax.xaxis.set_major_locator(MaxNLocator(nbins=6, integer=True))
+                ax.xaxis.set_major_formatter(FuncFormatter(self.format_category))
+
+    # Pick the level of detail for rows [0, stop) that fits the screen, limited to the zoomed range if any.
+    def visible_indices(self, stop):
+        if self.zoom_range is not None and self.series.x_increasing:
+            return self.series.lod.select_x(self.zoom_range[0], self.zoom_range[1], self.max_points, stop)
+        return self.series.lod.select(0, stop, self.max_points)
+
+    def on_zoom(self, ax):
+        x_range = ax.get_xlim()
+        self.zoom_range = None if x_range == self.full_range else x_range
+        if self.plot_type == 'line':
+            self.plot_line(self.current_frame)
+        elif self.plot_type == 'bar' and self.group_key is None:
+            self.plot_bar(self.current_frame)
+
+    def format_category(self, value, position):
+        index = int(round(value))
+        labels = self.series.x_labels
+        return str(labels[index]) if 0 <= index < len(labels) else ''
+
+    def init_line(self, ax):
+        series = self.series
+        self.line, = ax.plot([], [], marker='o')
+        self.set_limits(ax, series.x_positions, series.y_values)
+        ax.set_xlabel(series.x_column)
+        ax.set_ylabel(series.y_column)
+        ax.set_title('Animated Line Plot')
 
     def plot_line(self, i):
-        plt.plot(self.x_data[:i], self.y_data[:i], marker='o')
-        plt.xlabel(self.x_column)
-        plt.ylabel(self.y_column)
-        plt.title('Animated Line Plot')
+        self.current_frame = i
+        indices = self.visible_indices(self.series.frame_stops[i])
+        self.line.set_data(self.series.x_positions[indices], self.series.y_values[indices])
+        return [self.line]
+
+    # Draw the forecast as a static dashed line after the series.
+    def init_forecast(self, ax, forecast_x, forecast_y, step):
+        ax.plot(forecast_x, forecast_y, linestyle='--', color='C1', label=f'{self.series.forecast_model} forecast')
+        ax.legend(loc='upper left')
+
+        x_min, x_max = ax.get_xlim()
+        y_min, y_max = ax.get_ylim()
+        ax.set_xlim(x_min, max(x_max, forecast_x[-1] + step))
+        ax.set_ylim(min(y_min, forecast_y.min()), max(y_max, forecast_y.max() * 1.05))
+
+    def init_bar(self, ax):
+        series = self.series
+        # Text x values are grouped: one bar per category, growing with the aggregate of the rows shown so far.
+        self.group_key = None
+        if series.x_labels is not None:
+            self.group_key = series.group_by(self.aggregation)
+            positions = np.arange(len(series.x_labels), dtype=float)
+            top = series.aggregates[self.group_key][0][-1]
+        else:
+            positions = series.x_positions
+            top = np.nan_to_num(series.y_values)
+
+        # Every bar is a rectangle in a single collection, so adding bars never creates new artists.
+        left, right = positions - 0.4, positions + 0.4
+        base = np.zeros_like(top)
+        self.bar_vertices = np.stack([np.stack([left, base], axis=1), np.stack([left, top], axis=1),
+                                      np.stack([right, top], axis=1), np.stack([right, base], axis=1)], axis=1)
+        if self.group_key is not None:
+            # Start flat; the frames raise the bars, so the blit background never shows their final heights.
+            self.bars = PolyCollection(self.bar_vertices * [1, 0], facecolors='C0')
+        else:
+            self.bars = PolyCollection(self.bar_vertices[:0], facecolors='C0')
+        ax.add_collection(self.bars)
+        self.set_limits(ax, np.concatenate([left, right]), np.concatenate([base, top]))
+        ax.set_xlabel(series.x_column)
+        ax.set_ylabel(series.y_column if self.group_key is None else f'{self.aggregation} of {series.y_column}')
+        ax.set_title('Animated Bar Plot')
 
     def plot_bar(self, i):
-        plt.bar(self.x_data[:i], self.y_data[:i])
-        plt.xlabel(self.x_column)
-        plt.ylabel(self.y_column)
-        plt.title('Animated Bar Plot')
+        self.current_frame = i
+        if self.group_key is not None:
+            # Move the top edge of every category bar to its aggregate at this frame.
+            self.bar_vertices[:, 1:3, 1] = self.series.table_frame(self.group_key, i)[:, None]
+            self.bars.set_verts(self.bar_vertices)
+        else:
+            self.bars.set_verts(self.bar_vertices[self.visible_indices(self.series.frame_stops[i])])
+        return [self.bars]
 
     def plot_pie(self, i):
-        plt.pie(self.y_data[:i], labels=self.x_data[:i], autopct='%1.1f%%')
+        series = self.series
+        if series.x_labels is not None:
+            values = np.maximum(series.table_frame(series.group_by(self.aggregation), i), 0)
+            shown = np.flatnonzero(values)
+            values, labels = values[shown], np.asarray(series.x_labels)[shown]
+        else:
+            stop = series.frame_stops[i]
+            values, labels = series.y_data[:stop], series.x_data[:stop]
+        # Nothing to draw until the first rows with a positive value are shown.
+        if np.sum(values) > 0:
+            plt.pie(values, labels=labels, autopct='%1.1f%%')
         plt.title('Animated Pie Chart')
 
+    def init_histogram(self, ax):
+        series = self.series
+        # Fixed bin edges over the whole column keep the bars and axes stable while the counts grow.
+        self.histogram_key = series.histogram()
+        self.bin_edges = series.bin_edges
+        self.histogram_bars = ax.bar(self.bin_edges[:-1], np.zeros(HISTOGRAM_BINS), width=np.diff(self.bin_edges),
+                                     align='edge')
+        total_counts = series.aggregates[self.histogram_key][0][-1]
+        ax.set_xlim(self.bin_edges[0], self.bin_edges[-1])
+        ax.set_ylim(0, max(total_counts.max(), 1) * 1.05)
+        ax.set_xlabel(series.x_column)
+        ax.set_ylabel('Frequency')
+        ax.set_title('Animated Histogram')
+
+    # Each frame is a lookup in the cumulative bin counts instead of a new histogram of every row so far.
     def plot_histogram(self, i):
-        plt.hist(self.y_data[:i], bins=20)
-        plt.xlabel(self.x_column)
-        plt.ylabel('Frequency')
-        plt.title('Animated Histogram')
+        counts = self.series.table_frame(self.histogram_key, i)
+        for bar, count in zip(self.histogram_bars, counts):
+            bar.set_height(count)
+        return list(self.histogram_bars)
+
+    def set_limits(self, ax, x, y):
+        x_min, x_max = np.nanmin(x), np.nanmax(x)
+        y_min, y_max = np.nanmin(y), np.nanmax(y)
+        x_pad = (x_max - x_min) * 0.05 or 1
+        y_pad = (y_max - y_min) * 0.05 or 1
+        ax.set_xlim(x_min - x_pad, x_max + x_pad)
+        ax.set_ylim(y_min - y_pad, y_max + y_pad)
 
     def display_graph(self, instance):
+        if self.cancel_job():
+            return
         filename = self.file_chooser.selection and self.file_chooser.selection[0]
         if filename:
-            try:
-                data = pd.read_csv(filename)
-                self.x_column = self.column_input_1.text
-                self.y_column = self.column_input_2.text
-                self.x_data = data[self.x_column]
-                self.y_data = data[self.y_column]
-
-                plot_type = self.spinner.text
-                fig, ax = plt.subplots()
-                ani = FuncAnimation(fig, self.animate, fargs=(plot_type,), frames=len(data), interval=1000)
-
-                plt.tight_layout()
-                plt.show()
-            except Exception as e:
-                self.show_error_popup(f"Error: {e}")
+            x_column = self.column_input_1.text
+            y_column = self.column_input_2.text
+            lod_mode = self.lod_spinner.text
+            forecast_model = self.forecast_spinner.text
+            aggregation = self.aggregation_spinner.text
+            plot_type = self.spinner.text
+
+            # A file that changed on disk gets a new key, so stale series simply age out of the cache.
+            stat = os.stat(filename)
+            key = (os.path.abspath(filename), stat.st_size, stat.st_mtime_ns, x_column, y_column, lod_mode,
+                   forecast_model)
+            cached = self.series_cache.get(key)
+
+            # Parsing, the level-of-detail pyramid, the forecast and the aggregates run on the job;
+            # the figure is made here. A cached series may be on screen, so the job extends a copy of it
+            # and on_done swaps the copy into the cache.
+            def work(job):
+                if cached is None:
+                    data = load_columns(filename, [x_column, y_column], progress=job.progress)
+                    job.check()
+                    series = PlotSeries(data, x_column, y_column, lod_mode, forecast_model)
+                else:
+                    series = cached.copy()
+                job.check()
+                series.prepare(plot_type, aggregation)
+                return series
+
+            def on_done(series):
+                self.series_cache[key] = series
+                self.series_cache.move_to_end(key)
+                while len(self.series_cache) > MAX_CACHED_SERIES:
+                    self.series_cache.popitem(last=False)
+                self.show_graph(series, plot_type, aggregation)
+
+            self.start_job(self.display_button, work, on_done)
         else:
             self.show_error_popup("Please select a CSV file.")
 
+    def show_graph(self, series, plot_type, aggregation='sum'):
+        try:
+            self.series = series
+            self.aggregation = aggregation
+            fig, ax = plt.subplots()
+            self.init_plot(ax, plot_type)
+            self.animation = FuncAnimation(fig, self.animate, fargs=(plot_type,), frames=len(series.frame_stops),
+                                           init_func=lambda: [], interval=1000, blit=plot_type != 'pie')
+
+            plt.tight_layout()
+            plt.show()
+        except Exception as e:
+            self.show_error_popup(f"Error: {e}")
+
     def print_csv(self, instance):
+        if self.cancel_job():
+            return
         filename = self.file_chooser.selection and self.file_chooser.selection[0]
         if filename:
-            try:
-                data = pd.read_csv(filename)
-                self.csv_label.text = str(data)
-            except Exception as e:
-                self.show_error_popup(f"Error: {e}")
+            # Columns come back memory-mapped from the cache; the table only formats the rows it shows.
+            work = lambda job: load_columns(filename, progress=job.progress)
+            self.start_job(self.print_button, work, self.show_table)
         else:
             self.show_error_popup("Please select a CSV file.")
 
+    def show_table(self, data):
+        self.csv_label.text = f'{len(data)} rows x {len(data.columns)} columns'
+        self.table.set_data(data)
+
     def show_error_popup(self, message):
         popup = Popup(title='Error', content=Label(text=message), size_hint=(None, None), size=(400, 200))
         popup.open()
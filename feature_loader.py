@@ -0,0 +1,80 @@
+import importlib
+import time
+
+from kivy.app import App
+
+
+# One feature of the launcher: the module holding its Kivy App, the heavy modules it needs, and optionally a
+# function that warms it up. Nothing is imported until the feature is first used.
+class Feature:
+    def __init__(self, title, module, app_class, preload=(), warm=None):
+        self.title = title
+        self.module = module
+        self.app_class = app_class
+        # Plain modules without Kivy widgets, so they can be imported off the UI thread.
+        self.preload = preload
+        # (module, function) called on a worker thread after the preload, e.g. to create ML models.
+        self.warm = warm
+        self.app = None
+        self.root = None
+        self.import_seconds = None
+        self.warm_seconds = None
+        self.build_seconds = None
+
+    @property
+    def built(self):
+        return self.root is not None
+
+    # Function to import the heavy dependencies. Runs on a worker thread; importing twice costs nothing.
+    def load(self):
+        start = time.perf_counter()
+        for module in self.preload:
+            importlib.import_module(module)
+        if self.import_seconds is None:
+            self.import_seconds = time.perf_counter() - start
+
+    # Function to import the dependencies and run the warm-up function. Runs on a worker thread.
+    def warm_up(self):
+        self.load()
+        if self.warm is not None and self.warm_seconds is None:
+            start = time.perf_counter()
+            module, function = self.warm
+            getattr(importlib.import_module(module), function)()
+            self.warm_seconds = time.perf_counter() - start
+
+    # Function to import the feature's module and build its App on the main thread. Returns the root widget.
+    def build(self):
+        if self.root is None:
+            start = time.perf_counter()
+            app_class = getattr(importlib.import_module(self.module), self.app_class)
+            # Constructing an App makes it the running app; the launcher has to stay the one get_running_app()
+            # returns, or its lifecycle and settings would be handed to the feature.
+            running_app = App._running_app
+            try:
+                self.app = app_class()
+                self.root = self.app.build()
+            finally:
+                App._running_app = running_app
+            self.build_seconds = time.perf_counter() - start
+        return self.root
+
+    def timing_text(self):
+        parts = []
+        for label, seconds in (('import', self.import_seconds), ('warm-up', self.warm_seconds),
+                               ('build', self.build_seconds)):
+            if seconds is not None:
+                parts.append(f'{label} {seconds * 1000:.0f} ms')
+        return f"{self.title}: {', '.join(parts) or 'not loaded'}"
+
+    # Function to pass the App lifecycle on to the embedded feature.
+    def pause(self):
+        if self.app is not None:
+            self.app.on_pause()
+
+    def resume(self):
+        if self.app is not None:
+            self.app.on_resume()
+
+    def stop(self):
+        if self.app is not None:
+            self.app.on_stop()
@@ -1,197 +1,275 @@
+import argparse
+import os
+import threading
+import time
+
 import cv2
 import mediapipe as mp
 import numpy as np
 
+from landmark_recording import LandmarkRecorder
+from landmark_arrays import (DrawingStyle, FrameLandmarks, circumference, connection_array, draw_landmarks,
+                             eye_span, fingertips)
+from asset_cache import get_assets
+from overlay_cache import OverlayAssetCache, composite
+from model_scheduler import POSE_MODES, ModelScheduler
+from vr_metrics import LiveMetrics, MetricsExporter, draw_hud
+from vr_pipeline import run_pipeline
+from vr_timing import NULL_TIMER
+
 # Initialize mediapipe pose, face mesh, and hands classes.
 mp_pose = mp.solutions.pose
-mp_drawing = mp.solutions.drawing_utils
 mp_face_mesh = mp.solutions.face_mesh
 mp_hands = mp.solutions.hands
 
-# Initialize the pose, face mesh, and hands models.
-pose = mp_pose.Pose()
-face_mesh = mp_face_mesh.FaceMesh(max_num_faces=1, min_detection_confidence=0.5, min_tracking_confidence=0.5)
-hands = mp_hands.Hands(max_num_hands=2, min_detection_confidence=0.5, min_tracking_confidence=0.5)
-
-# Load the glasses and nail images with alpha channel.
-glasses_img = cv2.imread('images/blackglasses-removebg-preview (3).png', cv2.IMREAD_UNCHANGED)
-nail_image = cv2.imread('images/nail (1).png', cv2.IMREAD_UNCHANGED)
-
-# Function to calculate the circumference of landmarks.
-def calculate_circumference(landmarks, frame):
-    points = []
-    for landmark in landmarks:
-        x = int(landmark.x * frame.shape[1])
-        y = int(landmark.y * frame.shape[0])
-        points.append((x, y))
-
-    circumference = 0
-    for i in range(len(points) - 1):
-        circumference += np.sqrt((points[i + 1][0] - points[i][0]) ** 2 + (points[i + 1][1] - points[i][1]) ** 2)
-    circumference += np.sqrt((points[0][0] - points[-1][0]) ** 2 + (points[0][1] - points[-1][1]) ** 2)
-    return circumference
-
-# Function to overlay transparent image.
-def overlay_transparent(background, overlay, x, y, scale=1):
-    overlay = cv2.resize(overlay, (0, 0), fx=scale, fy=scale)
-    h, w, _ = overlay.shape
+# Function to create one set of the pose, face mesh, and hands models, as tracking graphs that only run
+# detection when they lose their landmarks. In ROI mode the scheduler resets a graph when its crop moves.
+def create_models():
+    pose = mp_pose.Pose(static_image_mode=False)
+    face_mesh = mp_face_mesh.FaceMesh(static_image_mode=False, max_num_faces=1,
+                                      min_detection_confidence=0.5, min_tracking_confidence=0.5)
+    hands = mp_hands.Hands(static_image_mode=False, max_num_hands=2,
+                           min_detection_confidence=0.5, min_tracking_confidence=0.5)
+    return pose, face_mesh, hands
+
+# Decides per frame which models run and carries landmarks forward in between.
+scheduler = None
+# The launcher may create the scheduler on a warm-up thread while the UI asks for it.
+scheduler_lock = threading.Lock()
+
+# Function to get the process-wide scheduler, creating its models on first use.
+def get_scheduler():
+    global scheduler
+    with scheduler_lock:
+        if scheduler is None:
+            scheduler = ModelScheduler(*create_models())
+    return scheduler
+
+# Size of the blank frame the models are warmed up on.
+WARMUP_FRAME_SHAPE = (480, 640, 3)
+warm_lock = threading.Lock()
+warmed = False
+
+# Function to create the models and run them once on a blank frame, so graph setup and the first inference
+# happen before the camera starts. Safe to call from any thread; only the first call does the work.
+def warm_models():
+    global warmed
+    with warm_lock:
+        if not warmed:
+            scheduler = get_scheduler()
+            scheduler.step(np.zeros(WARMUP_FRAME_SHAPE, dtype=np.uint8))
+            scheduler.reset()
+            warmed = True
+
+# Connection index arrays and drawing styles for the annotations.
+FACE_CONNECTIONS = connection_array(mp_face_mesh.FACEMESH_CONTOURS)
+POSE_CONNECTIONS = connection_array(mp_pose.POSE_CONNECTIONS)
+HAND_CONNECTIONS = connection_array(mp_hands.HAND_CONNECTIONS)
+FACE_STYLE = DrawingStyle((0, 255, 0), (0, 255, 0), thickness=1, circle_radius=1)
+BODY_STYLE = DrawingStyle((0, 255, 0), (0, 0, 255), thickness=2, circle_radius=2)
+
+# Function to load an accessory image with alpha channel, decoded once per process. The images ship in the
+# repository root; older checkouts kept them under images/.
+def load_accessory(file_name):
+    for path in (file_name, os.path.join('images', file_name)):
+        if os.path.exists(path):
+            return get_assets().bgra(path)
+    return None
+
+glasses_img = load_accessory('blackglasses-removebg-preview (3).png')
+nail_image = load_accessory('nail (1).png')
+
+# Keep premultiplied, pre-scaled copies of the accessories across frames.
+overlay_cache = OverlayAssetCache()
+overlay_cache.add('glasses', glasses_img)
+overlay_cache.add('nail', nail_image)
+
+# Function to overlay a cached accessory centered at (x, y).
+def overlay_transparent(background, asset_name, x, y, scale=1):
+    sprite = overlay_cache.get(asset_name, scale)
+    if sprite is None:
+        return background
     rows, cols, _ = background.shape
     if x >= cols or y >= rows:
         return background
-    y1, y2 = max(0, y - h // 2), min(rows, y + h // 2)
-    x1, x2 = max(0, x - w // 2), min(cols, x + w // 2)
-    y1o, y2o = max(0, -y + h // 2), min(h, rows - y + h // 2)
-    x1o, x2o = max(0, -x + w // 2), min(w, cols - x + w // 2)
-    if y1 >= y2 or x1 >= x2 or y1o >= y2o or x1o >= x2o:
-        return background
-    alpha_overlay = overlay[y1o:y2o, x1o:x2o, 3] / 255.0
-    alpha_background = 1.0 - alpha_overlay
-    for c in range(0, 3):
-        background[y1:y2, x1:x2, c] = (
-                alpha_overlay * overlay[y1o:y2o, x1o:x2o, c] +
-                alpha_background * background[y1:y2, x1:x2, c]
-        )
-    return background
-
-# Function to overlay glasses on the face.
-def overlay_glasses(frame, glasses_img, eye_landmarks, scale=1.2):
-    # Calculate the bounding box for the glasses based on eye landmarks
-    x_min = min([int(landmark.x * frame.shape[1]) for landmark in eye_landmarks])
-    x_max = max([int(landmark.x * frame.shape[1]) for landmark in eye_landmarks])
-    y_min = min([int(landmark.y * frame.shape[0]) for landmark in eye_landmarks])
-    y_max = max([int(landmark.y * frame.shape[0]) for landmark in eye_landmarks])
-
-    glasses_width = int((x_max - x_min) * scale)
-    glasses_height = int(glasses_width * (glasses_img.shape[0] / glasses_img.shape[1]))
-
-    # Resize the glasses image to fit the eyes
-    resized_glasses = cv2.resize(glasses_img, (glasses_width, glasses_height))
-
-    # Calculate the position to place the glasses
-    y_offset = y_min - int(glasses_height / 2)
-    x_offset = x_min - int((glasses_width - (x_max - x_min)) / 2)
+    return composite(background, sprite, x - sprite.width // 2, y - sprite.height // 2)
 
-    # Extract the alpha channel from the glasses image
-    alpha_s = resized_glasses[:, :, 3] / 255.0
-    alpha_l = 1.0 - alpha_s
+# Function to overlay glasses on the face, given the pixel bounding box of the eye corners.
+def overlay_glasses(frame, asset_name, eye_box, scale=1.2):
+    x_min, y_min, x_max, y_max = (int(value) for value in eye_box)
 
-    # Overlay the glasses image on the frame
-    for c in range(0, 3):
-        frame[y_offset:y_offset + glasses_height, x_offset:x_offset + glasses_width, c] = (
-            alpha_s * resized_glasses[:, :, c] + alpha_l * frame[y_offset:y_offset + glasses_height, x_offset:x_offset + glasses_width, c]
-        )
-
-# Start capturing video input from the webcam.
-cap = cv2.VideoCapture(0)
-
-while cap.isOpened():
-    ret, frame = cap.read()
+    # Fetch the glasses pre-scaled to fit the eyes
+    glasses = overlay_cache.get_width(asset_name, (x_max - x_min) * scale)
+    if glasses is None:
+        return
 
-    if not ret:
-        print("Failed to grab frame.")
-        break
-
-    # Convert the BGR image to RGB.
-    rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-
-    # Process the image and detect the pose, face mesh, and hands.
-    pose_result = pose.process(rgb_frame)
-    face_result = face_mesh.process(rgb_frame)
-    hands_result = hands.process(rgb_frame)
+    # Calculate the position to place the glasses
+    y_offset = y_min - int(glasses.height / 2)
+    x_offset = x_min - int((glasses.width - (x_max - x_min)) / 2)
 
-    face_circumference = 0
-    left_hand_circumference = 0
-    right_hand_circumference = 0
+    # Overlay the glasses image on the frame
+    composite(frame, glasses, x_offset, y_offset)
+
+# Function to detect the pose, face mesh, and hands on a BGR frame, running only the scheduled models.
+def detect(frame):
+    return get_scheduler().step(frame)
+
+# Function to collect the face and hand circumferences of a frame.
+def measure(landmarks):
+    left_hand_circumference, right_hand_circumference = landmarks.hand_circumferences()
+    return {
+        'face': circumference(landmarks.faces[0]) if landmarks.faces else 0,
+        'left_hand': left_hand_circumference,
+        'right_hand': right_hand_circumference,
+    }
+
+# Function to draw the annotations, measurements and overlays for one frame.
+def annotate(frame, result, timer=NULL_TIMER):
+    # Move every landmark into pixel space once for all the geometry below.
+    landmarks = FrameLandmarks(result, frame.shape[1], frame.shape[0])
 
     # Draw the face mesh annotation on the frame.
-    if face_result.multi_face_landmarks:
-        for face_landmarks in face_result.multi_face_landmarks:
-            mp_drawing.draw_landmarks(
-                frame,
-                face_landmarks,
-                mp_face_mesh.FACEMESH_CONTOURS,
-                mp_drawing.DrawingSpec(color=(0, 255, 0), thickness=1, circle_radius=1),
-                mp_drawing.DrawingSpec(color=(0, 255, 0), thickness=1, circle_radius=1),
-            )
-
-            face_circumference = calculate_circumference(face_landmarks.landmark, frame)
+    for face in landmarks.faces:
+        with timer.stage('draw_landmarks'):
+            draw_landmarks(frame, face, FACE_CONNECTIONS, FACE_STYLE)
+
+        face_circumference = circumference(face)
+        with timer.stage('putText'):
             cv2.putText(frame, f"Face Circumference: {int(face_circumference)} pixels", (10, 30),
                         cv2.FONT_HERSHEY_SIMPLEX, 1, (255, 255, 255), 2, cv2.LINE_AA)
 
-            # Define the indices for the left and right eyes
-            left_eye_indices = [33, 133]  # Inner corner, outer corner of the left eye
-            right_eye_indices = [362, 263]  # Inner corner, outer corner of the right eye
-
-            # Collect landmarks for the left and right eyes
-            left_eye_landmarks = [face_landmarks.landmark[i] for i in left_eye_indices]
-            right_eye_landmarks = [face_landmarks.landmark[i] for i in right_eye_indices]
-
-            # Overlay the glasses image on the frame
-            overlay_glasses(frame, glasses_img, left_eye_landmarks + right_eye_landmarks, scale=1.2)
+        # Overlay the glasses image over the span of both eyes
+        with timer.stage('overlay_glasses'):
+            overlay_glasses(frame, 'glasses', eye_span(face), scale=1.2)
 
     # Draw the pose annotation on the frame.
-    if pose_result.pose_landmarks:
-        mp_drawing.draw_landmarks(
-            frame,
-            pose_result.pose_landmarks,
-            mp_pose.POSE_CONNECTIONS,
-            mp_drawing.DrawingSpec(color=(0, 255, 0), thickness=2, circle_radius=2),
-            mp_drawing.DrawingSpec(color=(0, 0, 255), thickness=2, circle_radius=2),
-        )
-
-        # Define the indices for the left and right hands
-        left_hand_indices = [15, 17, 19, 21]  # Wrist, pinky, index, thumb
-        right_hand_indices = [16, 18, 20, 22]  # Wrist, pinky, index, thumb
-
-        # Collect landmarks for the left and right hands.
-        left_hand_landmarks = [pose_result.pose_landmarks.landmark[i] for i in left_hand_indices]
-        right_hand_landmarks = [pose_result.pose_landmarks.landmark[i] for i in right_hand_indices]
-
-        # Calculate the circumferences for the hands.
-        left_hand_circumference = calculate_circumference(left_hand_landmarks, frame)
-        right_hand_circumference = calculate_circumference(right_hand_landmarks, frame)
+    if landmarks.pose is not None:
+        with timer.stage('draw_landmarks'):
+            draw_landmarks(frame, landmarks.pose, POSE_CONNECTIONS, BODY_STYLE, landmarks.pose_visibility)
+
+    if landmarks.pose is not None or landmarks.hands:
+        # Calculate the circumferences for the hands, from pose when it ran and from the hands otherwise.
+        left_hand_circumference, right_hand_circumference = landmarks.hand_circumferences()
 
         # Display the circumferences on the frame.
-        cv2.putText(frame, f"Left Hand Circumference: {int(left_hand_circumference)} pixels", (10, 60),
-                    cv2.FONT_HERSHEY_SIMPLEX, 1, (255, 255, 255), 2, cv2.LINE_AA)
-        cv2.putText(frame, f"Right Hand Circumference: {int(right_hand_circumference)} pixels", (10, 90),
-                    cv2.FONT_HERSHEY_SIMPLEX, 1, (255, 255, 255), 2, cv2.LINE_AA)
+        with timer.stage('putText'):
+            cv2.putText(frame, f"Left Hand Circumference: {int(left_hand_circumference)} pixels", (10, 60),
+                        cv2.FONT_HERSHEY_SIMPLEX, 1, (255, 255, 255), 2, cv2.LINE_AA)
+            cv2.putText(frame, f"Right Hand Circumference: {int(right_hand_circumference)} pixels", (10, 90),
+                        cv2.FONT_HERSHEY_SIMPLEX, 1, (255, 255, 255), 2, cv2.LINE_AA)
 
     # Overlay nails on the hand landmarks.
-    if hands_result.multi_hand_landmarks:
-        for hand_landmarks in hands_result.multi_hand_landmarks:
-            mp_drawing.draw_landmarks(
-                frame,
-                hand_landmarks,
-                mp_hands.HAND_CONNECTIONS,
-                mp_drawing.DrawingSpec(color=(0, 255, 0), thickness=2, circle_radius=2),
-                mp_drawing.DrawingSpec(color=(0, 0, 255), thickness=2, circle_radius=2),
-            )
-
-            # Define the indices for the nail regions on each finger (tip and adjacent joints)
-            finger_indices = {
-                'thumb': 4,
-                'index': 8,
-                'middle': 12,
-                'ring': 16,
-                'pinky': 20
-            }
-
-            for finger, index in finger_indices.items():
-                landmark = hand_landmarks.landmark[index]
-                x = int(landmark.x * frame.shape[1])
-                y = int(landmark.y * frame.shape[0])
-
-                # Overlay the nail image with center alignment
-                frame = overlay_transparent(frame, nail_image, x, y, scale=0.5)
+    for hand in landmarks.hands:
+        with timer.stage('draw_landmarks'):
+            draw_landmarks(frame, hand, HAND_CONNECTIONS, BODY_STYLE)
+
+        # Overlay the nail image centered on each fingertip
+        for x, y in fingertips(hand).tolist():
+            with timer.stage('overlay_transparent'):
+                frame = overlay_transparent(frame, 'nail', x, y, scale=0.5)
+
+    return frame
+
+# Function to display an annotated frame, optionally with the metrics HUD. Returns False when 'q' is pressed.
+def show(frame, result, timer=NULL_TIMER, hud=False):
+    frame = annotate(frame, result, timer)
+    if hud:
+        with timer.stage('hud'):
+            draw_hud(frame, timer)
 
     # Display the frame.
-    cv2.imshow('Body and Face Circumference and Hand Nail Overlay', frame)
+    with timer.stage('display'):
+        cv2.imshow('Body and Face Circumference and Hand Nail Overlay', frame)
+        key = cv2.waitKey(1) & 0xFF
+    timer.frame_done()
 
     # Break the loop when 'q' is pressed.
-    if cv2.waitKey(1) & 0xFF == ord('q'):
-        break
-
-# Release the video capture object and close the display window.
-cap.release()
-cv2.destroyAllWindows()
+    return key != ord('q')
+
+# Function to add the model scheduling options to a command line parser.
+def add_scheduler_arguments(parser):
+    parser.add_argument('--face-interval', type=int, default=2, help='Run face mesh every N frames.')
+    parser.add_argument('--hands-interval', type=int, default=1, help='Run hand tracking every N frames.')
+    parser.add_argument('--pose-mode', choices=POSE_MODES, default='fallback',
+                        help="Run pose every frame, only when hands are lost ('fallback'), or never.")
+    parser.add_argument('--roi', action='store_true',
+                        help='Run each model on a downscaled crop around its previous landmarks.')
+    parser.add_argument('--roi-size', type=int, default=320, help='Longest side of the ROI crops, in pixels.')
+    parser.add_argument('--detect-size', type=int, default=640,
+                        help='Longest side of the full frame used for detection in ROI mode, in pixels.')
+
+# Function to turn parsed scheduling options into ModelScheduler keyword arguments.
+def scheduler_options(args):
+    return {
+        'face_interval': max(1, args.face_interval),
+        'hands_interval': max(1, args.hands_interval),
+        'pose_mode': args.pose_mode,
+        'roi': args.roi,
+        'roi_size': args.roi_size,
+        'detect_size': args.detect_size,
+    }
+
+# Function to apply parsed scheduling options to the process-wide scheduler.
+def configure_scheduler(args):
+    scheduler = get_scheduler()
+    scheduler.reset()
+    options = scheduler_options(args)
+    for name, value in options.items():
+        setattr(scheduler, name, value)
+
+def main():
+    parser = argparse.ArgumentParser(description='Glasses and nails virtual try-on.')
+    parser.add_argument('--camera', type=int, default=0, help='Index of the webcam to capture from.')
+    parser.add_argument('--queue-depth', type=int, default=1,
+                        help='Frames buffered between pipeline stages; older frames are dropped.')
+    parser.add_argument('--record', help='Stream the tracked landmarks of the session into this file.')
+    parser.add_argument('--hud', action='store_true', help='Draw frame rate and per-stage latency on the frame.')
+    parser.add_argument('--metrics-jsonl', help='Append a metrics snapshot to this JSON lines file periodically.')
+    parser.add_argument('--metrics-prom', help='Keep Prometheus-style metrics up to date in this text file.')
+    parser.add_argument('--metrics-interval', type=float, default=10.0, help='Seconds between metrics dumps.')
+    add_scheduler_arguments(parser)
+    args = parser.parse_args()
+    configure_scheduler(args)
+
+    # Per-stage timers are only installed when something reads them.
+    metrics = NULL_TIMER
+    exporter = None
+    if args.hud or args.metrics_jsonl or args.metrics_prom:
+        metrics = LiveMetrics()
+        get_scheduler().timer = metrics
+    if args.metrics_jsonl or args.metrics_prom:
+        exporter = MetricsExporter(metrics, args.metrics_jsonl, args.metrics_prom, args.metrics_interval)
+
+    # Start capturing video input from the webcam.
+    cap = cv2.VideoCapture(args.camera)
+
+    recorder = None
+    started_at = time.perf_counter()
+    # Read up front: the capture thread releases the device when the pipeline stops.
+    capture_fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+
+    def render(frame, result):
+        nonlocal recorder
+        if args.record:
+            if recorder is None:
+                recorder = LandmarkRecorder(args.record, frame.shape[1], frame.shape[0], capture_fps)
+            recorder.write(result, time.perf_counter() - started_at)
+        keep_running = show(frame, result, metrics, args.hud)
+        if exporter is not None:
+            exporter.maybe_export()
+        return keep_running
+
+    # Capture and inference run on their own threads; rendering stays on the main thread.
+    try:
+        run_pipeline(cap, detect, render, depth=args.queue_depth, timer=metrics)
+    finally:
+        if recorder is not None:
+            recorder.close()
+        if exporter is not None:
+            exporter.export()
+
+    # The capture thread has released the video capture object; close the display window.
+    cv2.destroyAllWindows()
+
+if __name__ == '__main__':
+    main()
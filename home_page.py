@@ -1,8 +1,35 @@
+import time
+
+# Startup is timed from here, before Kivy itself is imported.
+LAUNCHER_STARTED_AT = time.perf_counter()
+
 from kivy.app import App
+from kivy.clock import Clock
+from kivy.core.window import Window
 from kivy.uix.button import Button
 from kivy.uix.floatlayout import FloatLayout
+from kivy.uix.label import Label
+from kivy.uix.screenmanager import ScreenManager, Screen, NoTransition
 from kivy.graphics import Color, RoundedRectangle, Rectangle
 
+from asset_cache import get_assets
+from background_jobs import BackgroundJob
+from feature_loader import Feature
+
+# Features warmed up on a background thread while the user is on the home screen.
+PREWARM_FEATURES = ('tryon',)
+
+# Function to describe the features the home page opens. Each is only imported when first used.
+def create_features():
+    return {
+        'mood': Feature('Mood Analysis', 'mood_analysis', 'ImageSelectorApp',
+                        preload=('image_catalog', 'image_sampler', 'outfit_index', 'session_events')),
+        'tryon': Feature('VR Try-On', 'tryon_view', 'LiveTryOnApp', preload=('glasses_and_nails_vr',),
+                         warm=('glasses_and_nails_vr', 'warm_models')),
+        'prebook': Feature('Pre-Book', 'vr_selection_and_prebooking_page', 'TryOnApp',
+                           preload=('reservation_store',)),
+    }
+
 class ColoredButton(Button):
     def __init__(self, color, **kwargs):
         super(ColoredButton, self).__init__(**kwargs)
@@ -17,7 +44,25 @@ class ColoredButton(Button):
         self.rect.size = self.size
         self.rect.pos = self.pos
 
+# Screen holding an embedded feature, with a button back to the home page.
+class FeatureScreen(Screen):
+    def __init__(self, feature, go_home, **kwargs):
+        super(FeatureScreen, self).__init__(name=feature.module, **kwargs)
+        self.add_widget(feature.root)
+        home_button = Button(text='Home', size_hint=(None, None), size=(100, 40), pos_hint={'x': 0, 'top': 1})
+        home_button.bind(on_press=lambda instance: go_home())
+        self.add_widget(home_button)
+
+# Launcher for every feature in one process. Features are imported on first use, their heavy modules on a
+# worker thread, and shown as screens; coming back to a feature reuses the one already built.
 class MyntraApp(App):
+    def __init__(self, prewarm=PREWARM_FEATURES, **kwargs):
+        super(MyntraApp, self).__init__(**kwargs)
+        self.prewarm = prewarm
+        self.features = create_features()
+        self.current = None
+        self.loading = None
+
     def build(self):
         layout = FloatLayout()
 
@@ -26,21 +71,100 @@ class MyntraApp(App):
         button3 = ColoredButton(text='Design Your Own Dress & \n Show Your Graceful Walk (VR Contests)', size_hint=(None, None), size=(300, 50), pos_hint={'center_x': 0.5, 'center_y': 0.4}, color=(0.992, 0.780, 0.549, 1))  # #FDC78C
         button4 = ColoredButton(text='pre-book before release ', size_hint=(None, None), size=(300, 50), pos_hint={'center_x': 0.5, 'center_y': 0.3}, color=(0.957, 0.639, 0.443, 1))  # #F4A371
 
+        button1.bind(on_press=lambda instance: self.open_feature('mood'))
+        button2.bind(on_press=lambda instance: self.open_feature('tryon'))
+        button3.bind(on_press=self.on_design_button_press)
+        button4.bind(on_press=lambda instance: self.open_feature('prebook'))
+
         layout.add_widget(button1)
         layout.add_widget(button2)
         layout.add_widget(button3)
         layout.add_widget(button4)
 
-        root = FloatLayout()
-        with root.canvas.before:
-            self.bg = Rectangle(source='background.png', size=root.size, pos=root.pos)
-            root.bind(size=self.update_rect, pos=self.update_rect)
-        root.add_widget(layout)
-        return root
+        # Loading progress and timings
+        self.status = Label(text='', size_hint=(1, None), height=60, pos_hint={'x': 0, 'y': 0.1})
+        layout.add_widget(self.status)
+
+        self.home = FloatLayout()
+        with self.home.canvas.before:
+            # A downscaled background matched to the window, shared with the other screens
+            self.bg = Rectangle(texture=get_assets().background(Window.size), size=self.home.size, pos=self.home.pos)
+            self.home.bind(size=self.update_rect, pos=self.update_rect)
+        self.home.add_widget(layout)
+
+        self.screens = ScreenManager(transition=NoTransition())
+        home_screen = Screen(name='home')
+        home_screen.add_widget(self.home)
+        self.screens.add_widget(home_screen)
+
+        for name in self.prewarm:
+            feature = self.features[name]
+            BackgroundJob(lambda job, feature=feature: feature.warm_up(),
+                          on_done=lambda result, feature=feature: print(feature.timing_text()),
+                          on_error=lambda error, feature=feature: print(f'{feature.title}: warm-up failed: {error}'),
+                          name=f'warm-{name}').start()
+
+        # Runs once the first frame has been drawn.
+        Clock.schedule_once(self.report_startup)
+        return self.screens
 
     def update_rect(self, *args):
-        self.bg.size = self.root.size
-        self.bg.pos = self.root.pos
+        self.bg.texture = get_assets().background(Window.size)
+        self.bg.size = self.home.size
+        self.bg.pos = self.home.pos
+
+    def report_startup(self, dt):
+        print(f'launcher: home screen after {(time.perf_counter() - LAUNCHER_STARTED_AT) * 1000:.0f} ms')
+
+    # Function to show a feature, importing it in the background the first time.
+    def open_feature(self, name):
+        feature = self.features[name]
+        if feature.built:
+            self.show_feature(feature)
+            return
+        if self.loading is not None:
+            return
+        self.status.text = f'Loading {feature.title}...'
+        self.loading = BackgroundJob(lambda job: feature.load(),
+                                     on_done=lambda result: self.show_feature(feature),
+                                     on_error=lambda error: self.load_failed(feature, error),
+                                     on_finished=self.load_finished,
+                                     name=f'load-{name}').start()
+
+    def show_feature(self, feature):
+        if feature.built:
+            feature.resume()
+        else:
+            try:
+                feature.build()
+            except Exception as e:
+                self.load_failed(feature, e)
+                return
+            self.screens.add_widget(FeatureScreen(feature, self.go_home))
+            print(feature.timing_text())
+        self.status.text = feature.timing_text()
+        self.current = feature
+        self.screens.current = feature.module
+
+    def load_failed(self, feature, error):
+        self.status.text = f'{feature.title} could not be loaded: {error}'
+
+    def load_finished(self, job):
+        self.loading = None
+
+    def go_home(self):
+        if self.current is not None:
+            self.current.pause()
+            self.current = None
+        self.screens.current = 'home'
+
+    def on_design_button_press(self, instance):
+        # Placeholder until the dress designer and VR contests exist
+        self.status.text = 'Design Your Own Dress is coming soon!'
+
+    def on_stop(self):
+        for feature in self.features.values():
+            feature.stop()
 
 if __name__ == '__main__':
     MyntraApp().run()
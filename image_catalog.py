@@ -0,0 +1,168 @@
+import argparse
+import hashlib
+import os
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+
+CATALOG_DIR = '.image_catalog'
+IMAGE_EXTENSIONS = ('png', 'jpg', 'jpeg')
+# Size of the image tiles on the mood screens.
+TILE_SIZE = (300, 370)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS images (
+    path TEXT PRIMARY KEY,
+    root TEXT NOT NULL,
+    category TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    width INTEGER,
+    height INTEGER,
+    sha1 TEXT,
+    thumbnail TEXT
+);
+CREATE INDEX IF NOT EXISTS images_by_category ON images (root, category, path);
+"""
+
+
+# Function to measure, hash and thumbnail one image: (width, height, sha1, thumbnail path).
+# Runs on a worker thread; cv2 releases the GIL.
+def index_image(path, thumbnail_dir, tile_size):
+    with open(path, 'rb') as file:
+        content = file.read()
+    digest = hashlib.sha1(content).hexdigest()
+    image = cv2.imdecode(np.frombuffer(content, dtype=np.uint8), cv2.IMREAD_UNCHANGED)
+    if image is None:
+        return None, None, digest, None
+
+    height, width = image.shape[:2]
+    # Named by content, so identical files share one thumbnail. Images with alpha stay PNG.
+    has_alpha = image.ndim == 3 and image.shape[2] == 4
+    thumbnail = os.path.join(thumbnail_dir, f"{digest}_{tile_size[0]}x{tile_size[1]}.{'png' if has_alpha else 'jpg'}")
+    if not os.path.exists(thumbnail):
+        # The tiles stretch their image to the tile size, so the thumbnail is stretched the same way.
+        small = cv2.resize(image, tile_size, interpolation=cv2.INTER_AREA)
+        temporary_path = thumbnail + '.tmp' + os.path.splitext(thumbnail)[1]
+        cv2.imwrite(temporary_path, small, [] if has_alpha else [cv2.IMWRITE_JPEG_QUALITY, 90])
+        os.replace(temporary_path, thumbnail)
+    return width, height, digest, thumbnail
+
+
+# Function to index one image, or None if it cannot be read, so one bad file does not stop the update.
+def try_index_image(path, thumbnail_dir, tile_size):
+    try:
+        return index_image(path, thumbnail_dir, tile_size)
+    except Exception as e:
+        print(f"Image catalog: skipping '{path}': {e}")
+        return None
+
+
+# Persistent index of the images under <root>/<category>/, with their sizes, content hashes and tile thumbnails.
+# update() only re-reads files whose size or mtime changed, so startup cost no longer grows with image resolution.
+class ImageCatalog:
+    def __init__(self, directory=CATALOG_DIR, tile_size=TILE_SIZE, workers=None):
+        self.directory = directory
+        self.thumbnail_dir = os.path.join(directory, 'thumbnails')
+        self.tile_size = tile_size
+        self.workers = workers or min(8, os.cpu_count() or 1)
+        os.makedirs(self.thumbnail_dir, exist_ok=True)
+        self.connection = sqlite3.connect(os.path.join(directory, 'catalog.sqlite'))
+        self.connection.executescript(SCHEMA)
+        self.thumbnails = {}
+
+    # Function to bring the index up to date with the image directories. Returns (changed, removed) counts.
+    def update(self, roots=('images', 'clothes')):
+        known = {path: (size, mtime_ns) for path, size, mtime_ns in
+                 self.connection.execute('SELECT path, size, mtime_ns FROM images')}
+        known_roots = dict(self.connection.execute('SELECT path, root FROM images'))
+        seen = set()
+        changed = []
+        for root in roots:
+            if not os.path.isdir(root):
+                continue
+            for category in os.scandir(root):
+                if not category.is_dir():
+                    continue
+                for entry in os.scandir(category.path):
+                    if not entry.name.lower().endswith(IMAGE_EXTENSIONS) or not entry.is_file():
+                        continue
+                    path = os.path.join(root, category.name, entry.name)
+                    stat = entry.stat()
+                    seen.add(path)
+                    if known.get(path) != (stat.st_size, stat.st_mtime_ns):
+                        changed.append((path, root, category.name, stat.st_size, stat.st_mtime_ns))
+
+        if changed:
+            with ThreadPoolExecutor(self.workers) as executor:
+                indexed = executor.map(lambda item: try_index_image(item[0], self.thumbnail_dir, self.tile_size),
+                                       changed)
+                rows, failed = [], []
+                for item, result in zip(changed, indexed):
+                    if result is None:
+                        failed.append((item[0],))
+                    else:
+                        rows.append(item + result)
+            # A file that failed keeps no row, so it is left out of the screens and retried on the next update.
+            self.connection.executemany('INSERT OR REPLACE INTO images VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)', rows)
+            self.connection.executemany('DELETE FROM images WHERE path = ?', failed)
+
+        scanned_roots = [root for root in roots if os.path.isdir(root)]
+        removed = [(path,) for path in known if path not in seen and known_roots[path] in scanned_roots]
+        self.connection.executemany('DELETE FROM images WHERE path = ?', removed)
+        self.connection.commit()
+        self.thumbnails = dict(self.connection.execute('SELECT path, thumbnail FROM images'))
+        if changed or removed:
+            self.remove_unused_thumbnails()
+        return len(changed), len(removed)
+
+    # Function to delete thumbnails no image refers to any more, e.g. of removed or edited files, and the
+    # temporary files of writes that were cut short.
+    def remove_unused_thumbnails(self):
+        used = {os.path.basename(thumbnail) for (thumbnail,) in
+                self.connection.execute('SELECT thumbnail FROM images WHERE thumbnail IS NOT NULL')}
+        for entry in os.scandir(self.thumbnail_dir):
+            if entry.is_file() and entry.name not in used:
+                try:
+                    os.remove(entry.path)
+                except OSError:
+                    pass
+
+    # Function to list the image paths of each category under a root, read from the index.
+    def image_paths(self, root, categories):
+        paths = {category: [] for category in categories}
+        for category, path in self.connection.execute(
+                'SELECT category, path FROM images WHERE root = ? ORDER BY category, path', (root,)):
+            if category in paths:
+                paths[category].append(path)
+        return paths
+
+    # Function to get the tile-sized thumbnail of an image, falling back to the image itself.
+    def thumbnail(self, path):
+        return self.thumbnails.get(path) or path
+
+    def info(self, path):
+        row = self.connection.execute('SELECT width, height, sha1 FROM images WHERE path = ?', (path,)).fetchone()
+        return None if row is None else {'width': row[0], 'height': row[1], 'sha1': row[2]}
+
+    def close(self):
+        self.connection.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Index the mood images and clothes and build their tile thumbnails.')
+    parser.add_argument('roots', nargs='*', default=['images', 'clothes'])
+    parser.add_argument('--workers', type=int, help='Threads decoding changed images.')
+    args = parser.parse_args()
+
+    catalog = ImageCatalog(workers=args.workers)
+    changed, removed = catalog.update(args.roots)
+    count = catalog.connection.execute('SELECT COUNT(*) FROM images').fetchone()[0]
+    print(f'{count} images indexed ({changed} new or changed, {removed} removed)')
+    catalog.close()
+
+
+if __name__ == '__main__':
+    main()
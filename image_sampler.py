@@ -0,0 +1,77 @@
+import random
+
+
+class SamplerExhausted(LookupError):
+    pass
+
+
+# Draws items without replacement from several categories. Each category keeps its items in a shuffled
+# pool whose live part is pool[:remaining]; a draw takes the last live item and a discard swaps the item
+# with the last live one, so both are O(1) however large the category is.
+class ImageSampler:
+    def __init__(self, items_by_category, weights=None, seed=None):
+        self.items = {category: list(items) for category, items in items_by_category.items()}
+        self.weights = {category: 1.0 for category in self.items}
+        if weights:
+            self.weights.update(weights)
+        self.random = random.Random(seed)
+        self.reset()
+
+    # Function to put every item back, optionally reseeding for a repeatable sequence of draws.
+    def reset(self, seed=None):
+        if seed is not None:
+            self.random.seed(seed)
+        self.pools = {}
+        self.remaining = {}
+        self.positions = {}
+        for category, items in self.items.items():
+            pool = list(range(len(items)))
+            self.random.shuffle(pool)
+            self.pools[category] = pool
+            self.remaining[category] = len(pool)
+            for position, index in enumerate(pool):
+                self.positions[category, index] = position
+
+    def remaining_count(self, category=None):
+        if category is not None:
+            return self.remaining[category]
+        return sum(self.remaining.values())
+
+    # Function to pick a category with items left, weighted by the category weights.
+    def choose_category(self):
+        live = [category for category, count in self.remaining.items() if count and self.weights[category] > 0]
+        if not live:
+            raise SamplerExhausted('Every category has been used up.')
+        return self.random.choices(live, weights=[self.weights[category] for category in live])[0]
+
+    # Function to draw one unused item, from the given category or a weighted random one. Returns (item, category).
+    def draw(self, category=None):
+        if category is None:
+            category = self.choose_category()
+        elif not self.remaining[category]:
+            raise SamplerExhausted(f"No unused items left in '{category}'.")
+        self.remaining[category] -= 1
+        index = self.pools[category][self.remaining[category]]
+        return self.items[category][index], category
+
+    # Function to draw up to `count` items; fewer come back only when everything has been used.
+    def draw_many(self, count):
+        drawn = []
+        for _ in range(count):
+            try:
+                drawn.append(self.draw())
+            except SamplerExhausted:
+                break
+        return drawn
+
+    # Function to mark an item as used without drawing it, e.g. when it was shown by other means.
+    def discard(self, category, index):
+        pool = self.pools[category]
+        position = self.positions[category, index]
+        last = self.remaining[category] - 1
+        if position > last:
+            return
+        pool[position], pool[last] = pool[last], pool[position]
+        self.positions[category, pool[position]] = position
+        self.positions[category, index] = last
+        self.remaining[category] = last
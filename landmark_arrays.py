@@ -0,0 +1,101 @@
+import cv2
+import numpy as np
+
+# Fingertip landmarks of the hands model: thumb, index, middle, ring, pinky.
+FINGERTIP_INDICES = np.array([4, 8, 12, 16, 20])
+
+# Inner and outer corners of the left and right eyes in the face mesh.
+EYE_CORNER_INDICES = np.array([33, 133, 362, 263])
+
+# Wrist, pinky, index and thumb points of the pose model, for the left and right hands.
+POSE_LEFT_HAND_INDICES = np.array([15, 17, 19, 21])
+POSE_RIGHT_HAND_INDICES = np.array([16, 18, 20, 22])
+
+# The same points of the hands model.
+HAND_CIRCUMFERENCE_INDICES = np.array([0, 17, 5, 2])
+
+
+# Function to copy a MediaPipe landmark list into an (N, 3) array of normalized coordinates.
+def landmarks_to_array(landmark_list):
+    landmarks = landmark_list.landmark
+    values = (value for landmark in landmarks for value in (landmark.x, landmark.y, landmark.z))
+    return np.fromiter(values, dtype=np.float32, count=3 * len(landmarks)).reshape(-1, 3)
+
+
+# Function to turn a MediaPipe connection set into an (M, 2) index array.
+def connection_array(connections):
+    return np.array(sorted(connections), dtype=np.intp)
+
+
+# Function to get the perimeter of the closed polygon through the points, in order.
+def circumference(points):
+    xy = points[:, :2]
+    return float(np.linalg.norm(xy - np.roll(xy, 1, axis=0), axis=1).sum())
+
+
+# Function to get (x_min, y_min, x_max, y_max) of the points.
+def bounding_box(points):
+    (x_min, y_min), (x_max, y_max) = points[:, :2].min(axis=0), points[:, :2].max(axis=0)
+    return x_min, y_min, x_max, y_max
+
+
+# Function to get the integer pixel positions of the five fingertips of a hand.
+def fingertips(hand):
+    return hand[FINGERTIP_INDICES, :2].astype(np.int32)
+
+
+# Function to get the bounding box spanned by both eyes of a face.
+def eye_span(face):
+    return bounding_box(face[EYE_CORNER_INDICES])
+
+
+# Landmarks of one frame in pixel space, one (N, 3) array per face, hand and pose.
+class FrameLandmarks:
+    def __init__(self, result, width, height):
+        scale = np.array([width, height, width], dtype=np.float32)
+        self.width = width
+        self.height = height
+        self.faces = [points * scale for points in result.face_points]
+        self.hands = [points * scale for points in result.hand_points]
+        self.hand_labels = result.hand_labels
+        self.pose = None if result.pose_points is None else result.pose_points * scale
+        self.pose_visibility = result.pose_visibility
+
+    # Function to measure the left and right hands, from pose when it ran and from the hands otherwise.
+    def hand_circumferences(self):
+        if self.pose is not None:
+            return circumference(self.pose[POSE_LEFT_HAND_INDICES]), circumference(self.pose[POSE_RIGHT_HAND_INDICES])
+        measured = {label: circumference(hand[HAND_CIRCUMFERENCE_INDICES])
+                    for label, hand in zip(self.hand_labels, self.hands)}
+        return measured.get('left', 0), measured.get('right', 0)
+
+
+# Style for drawing landmark points and their connections, matching mediapipe's DrawingSpec.
+class DrawingStyle:
+    def __init__(self, point_color, line_color, thickness=2, circle_radius=2):
+        self.point_color = point_color
+        self.line_color = line_color
+        self.thickness = thickness
+        radius = np.arange(-circle_radius, circle_radius + 1)
+        dx, dy = np.meshgrid(radius, radius)
+        inside = dx * dx + dy * dy <= circle_radius * circle_radius
+        self.disc = np.stack([dx[inside], dy[inside]], axis=1)
+
+
+# Function to draw connections as one polyline batch and stamp every landmark point at once.
+def draw_landmarks(frame, points, connections, style, visibility=None, min_visibility=0.5):
+    xy = points[:, :2].astype(np.int32)
+    visible = None if visibility is None else np.asarray(visibility) >= min_visibility
+    if visible is not None:
+        connections = connections[visible[connections[:, 0]] & visible[connections[:, 1]]]
+    if len(connections):
+        cv2.polylines(frame, np.stack([xy[connections[:, 0]], xy[connections[:, 1]]], axis=1), False,
+                      style.line_color, style.thickness)
+
+    if visible is not None:
+        xy = xy[visible]
+    stamped = (xy[:, None, :] + style.disc[None, :, :]).reshape(-1, 2)
+    inside = ((stamped[:, 0] >= 0) & (stamped[:, 0] < frame.shape[1]) &
+              (stamped[:, 1] >= 0) & (stamped[:, 1] < frame.shape[0]))
+    stamped = stamped[inside]
+    frame[stamped[:, 1], stamped[:, 0]] = style.point_color
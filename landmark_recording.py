@@ -0,0 +1,182 @@
+import os
+import struct
+
+import numpy as np
+
+from landmark_arrays import (EYE_CORNER_INDICES, HAND_CIRCUMFERENCE_INDICES, POSE_LEFT_HAND_INDICES,
+                             POSE_RIGHT_HAND_INDICES)
+from model_scheduler import TrackedResult
+
+MAGIC = b'LMKREC01'
+HEADER = struct.Struct('<8sIIIfI')
+HEADER_SIZE = 64
+
+POSE_POINTS = 33
+FACE_POINTS = 468
+HAND_POINTS = 21
+MAX_HANDS = 2
+
+# Presence bits of each record.
+FACE_PRESENT = 1
+POSE_PRESENT = 2
+HAND_PRESENT = (4, 8)
+
+HAND_LABELS = ('', 'left', 'right')
+
+# One fixed-stride record per frame. Pose carries visibility as a fourth column.
+RECORD_DTYPE = np.dtype([
+    ('frame_index', '<u4'),
+    ('present', 'u1'),
+    ('hand_labels', 'u1', (MAX_HANDS,)),
+    ('padding', 'u1'),
+    ('timestamp', '<f8'),
+    ('pose', '<f4', (POSE_POINTS, 4)),
+    ('face', '<f4', (FACE_POINTS, 3)),
+    ('hands', '<f4', (MAX_HANDS, HAND_POINTS, 3)),
+])
+
+
+# Streams per-frame landmarks into a fixed-stride binary file through a preallocated block of records.
+class LandmarkRecorder:
+    def __init__(self, path, width, height, fps=30.0, block_size=64):
+        self.path = path
+        self.width = width
+        self.height = height
+        self.fps = fps
+        self.block = np.zeros(block_size, dtype=RECORD_DTYPE)
+        self.pending = 0
+        self.count = 0
+        self.file = open(path, 'wb')
+        self.write_header()
+
+    def write_header(self):
+        header = HEADER.pack(MAGIC, RECORD_DTYPE.itemsize, self.width, self.height, self.fps, self.count)
+        self.file.seek(0)
+        self.file.write(header.ljust(HEADER_SIZE, b'\0'))
+        self.file.seek(0, os.SEEK_END)
+
+    def write(self, result, timestamp=0.0):
+        record = self.block[self.pending]
+        record['frame_index'] = self.count
+        record['timestamp'] = timestamp
+        present = 0
+        labels = [0] * MAX_HANDS
+
+        if result.face_points:
+            record['face'] = result.face_points[0]
+            present |= FACE_PRESENT
+        if result.pose_points is not None:
+            record['pose'][:, :3] = result.pose_points
+            record['pose'][:, 3] = 1.0 if result.pose_visibility is None else result.pose_visibility
+            present |= POSE_PRESENT
+        for slot, (label, points) in enumerate(zip(result.hand_labels[:MAX_HANDS], result.hand_points)):
+            record['hands'][slot] = points
+            labels[slot] = HAND_LABELS.index(label) if label in HAND_LABELS else 0
+            present |= HAND_PRESENT[slot]
+
+        record['present'] = present
+        record['hand_labels'] = labels
+        self.pending += 1
+        self.count += 1
+        if self.pending == len(self.block):
+            self.flush()
+
+    def flush(self):
+        if self.pending:
+            self.file.write(self.block[:self.pending].tobytes())
+            self.block[:self.pending] = 0
+            self.pending = 0
+
+    def close(self):
+        if self.file.closed:
+            return
+        self.flush()
+        self.write_header()
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+        return False
+
+
+# Memory-mapped view of a recording for random access and batch analysis.
+class LandmarkRecording:
+    def __init__(self, path):
+        with open(path, 'rb') as file:
+            magic, record_size, self.width, self.height, self.fps, count = HEADER.unpack(file.read(HEADER.size))
+        if magic != MAGIC:
+            raise ValueError(f"'{path}' is not a landmark recording.")
+        if record_size != RECORD_DTYPE.itemsize:
+            raise ValueError(f"'{path}' was written with an incompatible record layout.")
+
+        # A recording that was not closed cleanly still has every flushed record on disk.
+        available = (os.path.getsize(path) - HEADER_SIZE) // record_size
+        count = available if count == 0 else min(count, available)
+        self.records = np.memmap(path, dtype=RECORD_DTYPE, mode='r', offset=HEADER_SIZE, shape=(count,))
+        self.scale = np.array([self.width, self.height, self.width], dtype=np.float32)
+
+    def __len__(self):
+        return len(self.records)
+
+    @property
+    def face_present(self):
+        return (self.records['present'] & FACE_PRESENT) != 0
+
+    @property
+    def pose_present(self):
+        return (self.records['present'] & POSE_PRESENT) != 0
+
+    def hand_present(self, slot):
+        return (self.records['present'] & HAND_PRESENT[slot]) != 0
+
+    # Function to rebuild the scheduler result of one frame, e.g. to re-render its overlays.
+    def result(self, index):
+        record = self.records[index]
+        result = TrackedResult()
+        if record['present'] & FACE_PRESENT:
+            result.face_points = [np.array(record['face'])]
+        if record['present'] & POSE_PRESENT:
+            result.pose_points = np.array(record['pose'][:, :3])
+            result.pose_visibility = np.array(record['pose'][:, 3])
+        for slot in range(MAX_HANDS):
+            if record['present'] & HAND_PRESENT[slot]:
+                result.hand_labels.append(HAND_LABELS[record['hand_labels'][slot]])
+                result.hand_points.append(np.array(record['hands'][slot]))
+        return result
+
+    # Function to measure the face in every frame at once, NaN where no face was tracked.
+    def face_circumferences(self, start=0, stop=None):
+        records = self.records[start:stop]
+        return np.where(self.face_present[start:stop], polygon_lengths(records['face'], self.scale), np.nan)
+
+    # Function to measure both hands in every frame at once, from pose when present and the hands otherwise.
+    def hand_circumferences(self, start=0, stop=None):
+        records = self.records[start:stop]
+        pose = records['pose'][:, :, :3]
+        pose_present = self.pose_present[start:stop]
+        measured = {
+            'left': np.where(pose_present, polygon_lengths(pose[:, POSE_LEFT_HAND_INDICES], self.scale), np.nan),
+            'right': np.where(pose_present, polygon_lengths(pose[:, POSE_RIGHT_HAND_INDICES], self.scale), np.nan),
+        }
+        for slot in range(MAX_HANDS):
+            hand = polygon_lengths(records['hands'][:, slot, HAND_CIRCUMFERENCE_INDICES], self.scale)
+            for code, label in enumerate(HAND_LABELS[1:], start=1):
+                use = ~pose_present & self.hand_present(slot)[start:stop] & (records['hand_labels'][:, slot] == code)
+                measured[label] = np.where(use, hand, measured[label])
+        return measured['left'], measured['right']
+
+    # Function to get the eye-corner bounding box of every frame as (F, 4) pixel x_min, y_min, x_max, y_max.
+    def eye_spans(self, start=0, stop=None):
+        eyes = self.records[start:stop]['face'][:, EYE_CORNER_INDICES, :2] * self.scale[:2]
+        spans = np.concatenate([eyes.min(axis=1), eyes.max(axis=1)], axis=1)
+        spans[~self.face_present[start:stop]] = np.nan
+        return spans
+
+
+# Function to get the closed polygon perimeter of each row of an (F, N, 3) normalized landmark batch.
+def polygon_lengths(points, scale):
+    xy = points[..., :2] * scale[:2]
+    return np.linalg.norm(xy - np.roll(xy, 1, axis=-2), axis=-1).sum(axis=-1)
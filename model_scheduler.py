@@ -0,0 +1,224 @@
+import math
+import time
+
+import numpy as np
+
+from landmark_arrays import landmarks_to_array
+from roi_inference import RegionInput, box_contains, landmark_box
+from vr_timing import NULL_TIMER
+
+POSE_MODES = ('always', 'fallback', 'never')
+
+
+# One-Euro filter over a whole landmark array, with constant-velocity prediction between updates.
+class LandmarkTrack:
+    def __init__(self, points, now, min_cutoff=1.0, beta=5.0, d_cutoff=1.0, visibility=None):
+        self.min_cutoff = min_cutoff
+        self.beta = beta
+        self.d_cutoff = d_cutoff
+        self.points = points
+        self.velocity = np.zeros_like(points)
+        self.visibility = visibility
+        self.updated_at = now
+
+    @staticmethod
+    def smoothing(cutoff, dt):
+        tau = 1.0 / (2 * math.pi * cutoff)
+        return 1.0 / (1.0 + tau / dt)
+
+    def update(self, points, now, visibility=None):
+        dt = max(now - self.updated_at, 1e-3)
+        velocity = (points - self.points) / dt
+        self.velocity += self.smoothing(self.d_cutoff, dt) * (velocity - self.velocity)
+        cutoff = self.min_cutoff + self.beta * np.abs(self.velocity)
+        tau = 1.0 / (2 * np.pi * cutoff)
+        alpha = 1.0 / (1.0 + tau / dt)
+        self.points = self.points + alpha * (points - self.points)
+        self.visibility = visibility
+        self.updated_at = now
+        return self.points
+
+    def predict(self, now, max_horizon):
+        return self.points + self.velocity * min(now - self.updated_at, max_horizon)
+
+
+# Normalized landmark arrays for one frame, and which models actually ran.
+class TrackedResult:
+    def __init__(self):
+        self.face_points = []
+        self.hand_points = []
+        self.hand_labels = []
+        self.pose_points = None
+        self.pose_visibility = None
+        self.ran = ()
+
+
+# Decides per frame which models to run and carries landmarks forward between inferences.
+class ModelScheduler:
+    def __init__(self, pose, face_mesh, hands, face_interval=2, hands_interval=1, pose_mode='fallback',
+                 max_prediction=0.1, track_timeout=0.5, roi=False, roi_size=320, detect_size=640, roi_refresh=15):
+        if pose_mode not in POSE_MODES:
+            raise ValueError(f"Unknown pose mode '{pose_mode}', expected one of {POSE_MODES}.")
+        self.pose = pose
+        self.face_mesh = face_mesh
+        self.hands = hands
+        self.face_interval = max(1, face_interval)
+        self.hands_interval = max(1, hands_interval)
+        self.pose_mode = pose_mode
+        self.max_prediction = max_prediction
+        self.track_timeout = track_timeout
+        # In ROI mode each model sees a downscaled crop around its landmarks, and a full-frame detection runs
+        # every roi_refresh frames or whenever tracking is lost. The graphs track from one input to the next in
+        # that input's coordinates, so a crop is kept while the landmarks stay well inside it, and a graph is
+        # reset whenever its input region changes.
+        self.roi = roi
+        self.roi_size = roi_size
+        self.detect_size = detect_size
+        self.roi_refresh = max(1, roi_refresh)
+        # Crop box each model saw last, None for the full frame.
+        self.boxes = {}
+        self.timer = NULL_TIMER
+        self.frame_index = 0
+        self.frame = None
+        self.full_region = None
+        self.face_tracks = {}
+        self.hand_tracks = {}
+        self.pose_tracks = {}
+
+    # Function to start over, including the tracking state inside the graphs, so a new run does not follow
+    # landmarks from the last one.
+    def reset(self):
+        self.frame_index = 0
+        self.face_tracks = {}
+        self.hand_tracks = {}
+        self.pose_tracks = {}
+        self.boxes = {}
+        for model in (self.pose, self.face_mesh, self.hands):
+            self.reset_graph(model)
+
+    # MediaPipe solutions restart their graph with reset(); other models have no state to clear.
+    def reset_graph(self, model):
+        reset = getattr(model, 'reset', None)
+        if reset is not None:
+            with self.timer.stage('graph.reset'):
+                reset()
+
+    def close(self):
+        for model in (self.pose, self.face_mesh, self.hands):
+            model.close()
+
+    def update_tracks(self, tracks, measurements, now):
+        updated = {}
+        for key, (points, visibility) in measurements.items():
+            track = tracks.get(key)
+            if track is None:
+                updated[key] = LandmarkTrack(points, now, visibility=visibility)
+            else:
+                track.update(points, now, visibility)
+                updated[key] = track
+        return updated
+
+    def predict_tracks(self, tracks, now):
+        return {key: track for key, track in tracks.items() if now - track.updated_at <= self.track_timeout}
+
+    def run_face(self, region, now):
+        with self.timer.stage('face_mesh.process'):
+            face_result = self.face_mesh.process(region.rgb)
+        measurements = {}
+        for i, face_landmarks in enumerate(face_result.multi_face_landmarks or []):
+            measurements[i] = (region.to_frame(landmarks_to_array(face_landmarks)), None)
+        self.face_tracks = self.update_tracks(self.face_tracks, measurements, now)
+
+    def run_hands(self, region, now):
+        with self.timer.stage('hands.process'):
+            hands_result = self.hands.process(region.rgb)
+        measurements = {}
+        hand_landmarks = hands_result.multi_hand_landmarks or []
+        handedness = hands_result.multi_handedness or []
+        for i, landmarks in enumerate(hand_landmarks):
+            # MediaPipe labels hands as if the image were mirrored, so swap them for the raw webcam view.
+            label = handedness[i].classification[0].label if i < len(handedness) else ''
+            label = {'Left': 'right', 'Right': 'left'}.get(label, f'hand{i}')
+            if label in measurements:
+                label = f'{label}{i}'
+            measurements[label] = (region.to_frame(landmarks_to_array(landmarks)), None)
+        self.hand_tracks = self.update_tracks(self.hand_tracks, measurements, now)
+
+    def run_pose(self, region, now):
+        with self.timer.stage('pose.process'):
+            pose_result = self.pose.process(region.rgb)
+        measurements = {}
+        if pose_result.pose_landmarks:
+            visibility = np.array([landmark.visibility for landmark in pose_result.pose_landmarks.landmark],
+                                  dtype=np.float32)
+            measurements['pose'] = (region.to_frame(landmarks_to_array(pose_result.pose_landmarks)), visibility)
+        self.pose_tracks = self.update_tracks(self.pose_tracks, measurements, now)
+
+    # Get the model input for this frame: a crop around the tracked landmarks in ROI mode, otherwise
+    # the whole frame, converted to RGB once and only if a model runs.
+    def region(self, model, tracks, margin):
+        box = None
+        if self.roi and tracks and self.frame_index % self.roi_refresh != 0:
+            height, width = self.frame.shape[:2]
+            points = [track.points for track in tracks.values()]
+            box = self.boxes.get(model)
+            # Keep the current crop while the landmarks, with half the margin, still fit inside it.
+            needed = landmark_box(points, width, height, margin / 2)
+            if box is None or needed is None or not box_contains(box, needed):
+                box = landmark_box(points, width, height, margin)
+        if self.roi and box != self.boxes.get(model):
+            self.boxes[model] = box
+            self.reset_graph(model)
+        if box is not None:
+            with self.timer.stage('convert'):
+                return RegionInput(self.frame, box, self.roi_size)
+        if self.full_region is None:
+            with self.timer.stage('convert'):
+                self.full_region = RegionInput(self.frame, max_side=self.detect_size if self.roi else None)
+        return self.full_region
+
+    def step(self, frame, now=None):
+        now = time.perf_counter() if now is None else now
+        ran = []
+        self.frame = frame
+        self.full_region = None
+
+        run_face = not self.face_tracks or self.frame_index % self.face_interval == 0
+        run_hands = not self.hand_tracks or self.frame_index % self.hands_interval == 0
+
+        if run_face:
+            self.run_face(self.region(self.face_mesh, self.face_tracks, 0.3), now)
+            ran.append('face')
+        else:
+            self.face_tracks = self.predict_tracks(self.face_tracks, now)
+
+        if run_hands:
+            self.run_hands(self.region(self.hands, self.hand_tracks, 0.5), now)
+            ran.append('hands')
+        else:
+            self.hand_tracks = self.predict_tracks(self.hand_tracks, now)
+
+        # The hands model already gives the wrist and knuckle points, so pose only runs when hands are lost.
+        if self.pose_mode == 'always' or (self.pose_mode == 'fallback' and not self.hand_tracks):
+            self.run_pose(self.region(self.pose, self.pose_tracks, 0.2), now)
+            ran.append('pose')
+        else:
+            self.pose_tracks = {}
+
+        self.frame_index += 1
+        self.frame = self.full_region = None
+        return self.build_result(now, ran)
+
+    def build_result(self, now, ran):
+        result = TrackedResult()
+        result.ran = tuple(ran)
+
+        result.face_points = [track.predict(now, self.max_prediction) for track in self.face_tracks.values()]
+        result.hand_labels = list(self.hand_tracks.keys())
+        result.hand_points = [track.predict(now, self.max_prediction) for track in self.hand_tracks.values()]
+
+        pose_track = self.pose_tracks.get('pose')
+        if pose_track is not None:
+            result.pose_points = pose_track.predict(now, self.max_prediction)
+            result.pose_visibility = pose_track.visibility
+        return result
@@ -1,6 +1,4 @@
-import os
 import random
-import csv
 from kivy.app import App
 from kivy.uix.gridlayout import GridLayout
 from kivy.uix.button import Button
@@ -9,11 +7,22 @@ from kivy.core.window import Window
 from kivy.uix.boxlayout import BoxLayout
 from kivy.uix.label import Label
 
+from image_catalog import ImageCatalog
+from image_sampler import ImageSampler
+from outfit_index import load_recommender
+from session_events import SessionEventLog
+from texture_prefetch import ImageTile, TexturePrefetcher
+
+# Images shown on each selection screen.
+IMAGES_PER_SCREEN = 4
+CATEGORIES = ('beach', 'mountain', 'galaxy', 'forest')
+
 class ImageSelectionScreen(Screen):
-    def __init__(self, image_paths, used_images, **kwargs):
+    def __init__(self, sampler, catalog, prefetcher, **kwargs):
         super().__init__(**kwargs)
-        self.image_paths = image_paths
-        self.used_images = used_images
+        self.sampler = sampler
+        self.catalog = catalog
+        self.prefetcher = prefetcher
         self.layout = GridLayout(cols=2, spacing=10, padding=10)
         self.add_widget(self.layout)
         self.display_random_images()
@@ -21,15 +30,13 @@ class ImageSelectionScreen(Screen):
     def display_random_images(self):
         self.layout.clear_widgets()
         self.current_images = []
-        categories = list(self.image_paths.keys())
-        for _ in range(4):
-            while True:
-                category = random.choice(categories)
-                image_path = random.choice(self.image_paths[category])
-                if image_path not in self.used_images:
-                    break
-            self.used_images.add(image_path)
-            btn = Button(background_normal=image_path, size=(300, 370), size_hint=(None, None))
+        # The sampler never repeats an image within a session and says so once the catalog runs out.
+        drawn = self.sampler.draw_many(IMAGES_PER_SCREEN)
+        if len(drawn) < IMAGES_PER_SCREEN:
+            self.layout.add_widget(Label(text='No more new images to show.'))
+        for image_path, category in drawn:
+            # Tiles fill in once the prefetcher has decoded them, so building the next screens never blocks.
+            btn = ImageTile(self.prefetcher, self.catalog.thumbnail(image_path), size=(300, 370), size_hint=(None, None))
             btn.image_data = (image_path, category)
             btn.bind(on_press=self.select_image)
             self.layout.add_widget(btn)
@@ -37,38 +44,58 @@ class ImageSelectionScreen(Screen):
 
     def select_image(self, instance):
         self.manager.selected_images.append(instance.image_data)
-        self.write_to_csv(instance.image_data)
+        self.manager.get_screen('recommendation').recommend(self.manager.selected_images)
+        self.manager.events.log('select', *instance.image_data)
         instance.disabled = True  # Disable the button to indicate selection
         if len(self.manager.selected_images) < 12:
             self.manager.current = self.manager.next()
         else:
             self.manager.current = 'recommendation'
 
-    def write_to_csv(self, image_data):
-        with open('selected_images.csv', 'a', newline='') as file:
-            writer = csv.writer(file)
-            writer.writerow(image_data)
-
 
 class ClothesRecommendationScreen(Screen):
-    def __init__(self, cloth_paths, **kwargs):
+    def __init__(self, cloth_paths, catalog, prefetcher, recommender=None, **kwargs):
         super().__init__(**kwargs)
         self.cloth_paths = cloth_paths
+        self.catalog = catalog
+        self.prefetcher = prefetcher
+        self.recommender = recommender
+        self.suggested_clothes = []
         self.layout = GridLayout(cols=2, spacing=10, padding=10)
         self.add_widget(self.layout)
 
     def on_enter(self):
         self.display_clothes()
 
+    # Pick outfits for the images selected so far as soon as one is chosen, and start decoding new tiles while
+    # the user keeps choosing. Outfits come from the color index when it is built, else at random.
+    def recommend(self, selected_images):
+        picks = [[] for _ in selected_images]
+        if self.recommender is not None:
+            picks = self.recommender.recommend(selected_images)
+
+        previous = self.suggested_clothes
+        self.suggested_clothes = []
+        for i, ((_, category), pick) in enumerate(zip(selected_images, picks)):
+            if pick:
+                cloth = pick[0]
+            elif i < len(previous):
+                cloth = previous[i]
+            elif self.cloth_paths[category]:
+                cloth = random.choice(self.cloth_paths[category])
+            else:
+                continue
+            self.suggested_clothes.append(cloth)
+            if cloth not in previous:
+                self.manager.events.log('recommend', cloth, category)
+                self.prefetcher.prefetch([self.catalog.thumbnail(cloth)])
+
     def display_clothes(self):
         self.layout.clear_widgets()
-        selected_categories = [category for _, category in self.manager.selected_images]
-        suggested_clothes = []
-        for category in selected_categories:
-            clothes = random.sample(self.cloth_paths[category], 1)
-            suggested_clothes.extend(clothes)
-        for cloth in suggested_clothes:
-            btn = Button(background_normal=cloth, size=(300, 370), size_hint=(None, None))
+        # The detail screen shows the full image, so those are fetched while the recommendations are on screen.
+        self.prefetcher.prefetch(self.suggested_clothes)
+        for cloth in self.suggested_clothes:
+            btn = ImageTile(self.prefetcher, self.catalog.thumbnail(cloth), size=(300, 370), size_hint=(None, None))
             btn.cloth_data = cloth
             btn.bind(on_press=self.show_cloth_details)
             self.layout.add_widget(btn)
@@ -85,17 +112,24 @@ class ClothesRecommendationScreen(Screen):
         self.layout.add_widget(btn)
 
     def show_cloth_details(self, instance):
+        self.manager.events.log('view_cloth', instance.cloth_data)
         self.manager.current = 'cloth_detail'
         self.manager.get_screen('cloth_detail').display_cloth(instance.cloth_data)
 
     def restart(self, instance):
         self.manager.selected_images = []
+        self.suggested_clothes = []
+        self.manager.events.new_session()
+        self.manager.sampler.reset()
+        for name in ('screen1', 'screen2', 'screen3'):
+            self.manager.get_screen(name).display_random_images()
         self.manager.current = 'screen1'
 
 
 class ClothDetailScreen(Screen):
-    def __init__(self, **kwargs):
+    def __init__(self, prefetcher, **kwargs):
         super().__init__(**kwargs)
+        self.prefetcher = prefetcher
         self.layout = BoxLayout(orientation='vertical', spacing=10, padding=10)
         self.add_widget(self.layout)
 
@@ -104,7 +138,7 @@ class ClothDetailScreen(Screen):
 
         # Centered BoxLayout for the image
         image_box = BoxLayout(orientation='vertical', size_hint=(None, None), size=(300, 437))
-        img = Button(background_normal=cloth_path, size_hint=(None, None), size=(300, 437))
+        img = ImageTile(self.prefetcher, cloth_path, size_hint=(None, None), size=(300, 437))
         image_box.add_widget(img)
         self.layout.add_widget(image_box)
 
@@ -132,40 +166,36 @@ class ClothDetailScreen(Screen):
 
 class ImageSelectorApp(App):
     def build(self):
-        Window.size = (900, 1100)  # Set window size to fit images
-        self.image_paths = {
-            'beach': self.load_images('images/beach'),
-            'mountain': self.load_images('images/mountain'),
-            'galaxy': self.load_images('images/galaxy'),
-            'forest': self.load_images('images/forest'),
-        }
-        self.cloth_paths = {
-            'beach': self.load_images('clothes/beach'),
-            'mountain': self.load_images('clothes/mountain'),
-            'galaxy': self.load_images('clothes/galaxy'),
-            'forest': self.load_images('clothes/forest'),
-        }
+        # The catalog only decodes new or changed files; the tiles show its pre-sized thumbnails.
+        self.catalog = ImageCatalog()
+        self.catalog.update(('images', 'clothes'))
+        self.prefetcher = TexturePrefetcher()
+        # Built offline with `python outfit_index.py`.
+        self.recommender = load_recommender()
+        self.image_paths = self.catalog.image_paths('images', CATEGORIES)
+        self.cloth_paths = self.catalog.image_paths('clothes', CATEGORIES)
 
         sm = ScreenManager(transition=SlideTransition())
         sm.selected_images = []
-        sm.used_images = set()
-
-        sm.add_widget(ImageSelectionScreen(name='screen1', image_paths=self.image_paths, used_images=sm.used_images))
-        sm.add_widget(ImageSelectionScreen(name='screen2', image_paths=self.image_paths, used_images=sm.used_images))
-        sm.add_widget(ImageSelectionScreen(name='screen3', image_paths=self.image_paths, used_images=sm.used_images))
-        sm.add_widget(ClothesRecommendationScreen(name='recommendation', cloth_paths=self.cloth_paths))
-        sm.add_widget(ClothDetailScreen(name='cloth_detail'))
-
-        # Initialize the CSV file with headers
-        with open('selected_images.csv', 'w', newline='') as file:
-            writer = csv.writer(file)
-            writer.writerow(['Image Path', 'Category'])
+        sm.sampler = ImageSampler(self.image_paths)
+        # Selections go to a shared SQLite log, buffered and written off the UI thread, one session per user.
+        self.events = sm.events = SessionEventLog()
+
+        for name in ('screen1', 'screen2', 'screen3'):
+            sm.add_widget(ImageSelectionScreen(name=name, sampler=sm.sampler, catalog=self.catalog,
+                                               prefetcher=self.prefetcher))
+        sm.add_widget(ClothesRecommendationScreen(name='recommendation', cloth_paths=self.cloth_paths,
+                                                  catalog=self.catalog, prefetcher=self.prefetcher,
+                                                  recommender=self.recommender))
+        sm.add_widget(ClothDetailScreen(name='cloth_detail', prefetcher=self.prefetcher))
 
         return sm
 
-    def load_images(self, directory):
-        return [os.path.join(directory, f) for f in os.listdir(directory) if f.endswith(('png', 'jpg', 'jpeg'))]
+    def on_stop(self):
+        self.events.close()
 
 
 if __name__ == '__main__':
+    # Only when run on its own; inside the launcher the window belongs to the launcher.
+    Window.size = (900, 1100)  # Set window size to fit images
     ImageSelectorApp().run()
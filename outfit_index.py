@@ -0,0 +1,145 @@
+import argparse
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+
+from image_catalog import CATALOG_DIR, ImageCatalog
+
+INDEX_DIR = os.path.join(CATALOG_DIR, 'features')
+# Hue, saturation and value bins of the color histogram.
+HISTOGRAM_BINS = (16, 4, 4)
+FEATURE_SIZE = int(np.prod(HISTOGRAM_BINS))
+
+
+# Function to describe an image by its HSV color histogram. The square root of the normalized histogram has
+# unit length, so the dot product of two vectors is their Bhattacharyya similarity, between 0 and 1.
+def image_features(path):
+    image = cv2.imread(path, cv2.IMREAD_COLOR)
+    if image is None:
+        return None
+    hsv = cv2.cvtColor(image, cv2.COLOR_BGR2HSV)
+    histogram = cv2.calcHist([hsv], [0, 1, 2], None, list(HISTOGRAM_BINS), [0, 180, 0, 256, 0, 256]).ravel()
+    return np.sqrt(histogram / max(histogram.sum(), 1.0)).astype(np.float32)
+
+
+def index_files(root, directory=INDEX_DIR):
+    return {name: os.path.join(directory, f'{root}.{name}.npy') for name in ('vectors', 'paths', 'categories', 'sha1')}
+
+
+# Function to compute the feature matrix of every catalogued image under a root, reusing the vectors of
+# images whose content hash is unchanged since the last build. Returns the number of images computed.
+def build_index(catalog, root, directory=INDEX_DIR, workers=None):
+    os.makedirs(directory, exist_ok=True)
+    files = index_files(root, directory)
+    rows = catalog.connection.execute('SELECT path, category, sha1, thumbnail FROM images '
+                                      'WHERE root = ? AND sha1 IS NOT NULL ORDER BY path', (root,)).fetchall()
+
+    previous = {}
+    if all(os.path.exists(path) for path in files.values()):
+        # Read into memory: the file is replaced below.
+        old_vectors = np.load(files['vectors'])
+        previous = {digest: i for i, digest in enumerate(np.load(files['sha1']))}
+
+    missing = [row for row in rows if row[2] not in previous]
+    # Thumbnails keep the colors of the full image and are much cheaper to decode.
+    with ThreadPoolExecutor(workers or min(8, os.cpu_count() or 1)) as executor:
+        computed = dict(zip((row[2] for row in missing),
+                            executor.map(lambda row: image_features(row[3] or row[0]), missing)))
+
+    vectors = np.zeros((len(rows), FEATURE_SIZE), dtype=np.float32)
+    keep = np.ones(len(rows), dtype=bool)
+    for i, (path, category, digest, thumbnail) in enumerate(rows):
+        vector = old_vectors[previous[digest]] if digest in previous else computed[digest]
+        if vector is None:
+            keep[i] = False
+        else:
+            vectors[i] = vector
+
+    # Write every file under a temporary name first so a running app never sees half an index.
+    arrays = {
+        'vectors': vectors[keep],
+        'paths': np.asarray([row[0] for row in rows], dtype=str)[keep],
+        'categories': np.asarray([row[1] for row in rows], dtype=str)[keep],
+        'sha1': np.asarray([row[2] for row in rows], dtype=str)[keep],
+    }
+    for name, array in arrays.items():
+        np.save(files[name] + '.tmp.npy', array)
+    for name in arrays:
+        os.replace(files[name] + '.tmp.npy', files[name])
+    return len(missing)
+
+
+# Feature vectors of one root, memory-mapped, with a lookup from path to row.
+class FeatureIndex:
+    def __init__(self, root, directory=INDEX_DIR):
+        files = index_files(root, directory)
+        self.vectors = np.load(files['vectors'], mmap_mode='r')
+        self.paths = np.load(files['paths'])
+        self.category_names, self.category_codes = np.unique(np.load(files['categories']), return_inverse=True)
+        self.row_of = {path: i for i, path in enumerate(self.paths)}
+
+    def __len__(self):
+        return len(self.paths)
+
+
+# Scores every selected mood image against the whole clothing catalog in one matrix product.
+class OutfitRecommender:
+    def __init__(self, images, clothes):
+        self.images = images
+        self.clothes = clothes
+
+    # Function to pick k outfits per selected (path, category), each from the same category and never the same
+    # outfit twice. Returns one list of cloth paths per selection, empty if it could not be scored.
+    def recommend(self, selected, k=1):
+        rows = np.asarray([self.images.row_of.get(path, -1) for path, _ in selected])
+        known = np.flatnonzero(rows >= 0)
+        results = [[] for _ in selected]
+        if not len(known) or not len(self.clothes):
+            return results
+
+        queries = np.asarray(self.images.vectors[rows[known]])
+        scores = queries @ np.asarray(self.clothes.vectors).T
+
+        # Only clothes of the mood's category are candidates.
+        names = list(self.clothes.category_names)
+        codes = np.asarray([names.index(selected[i][1]) if selected[i][1] in names else -1 for i in known])
+        scores[self.clothes.category_codes[None, :] != codes[:, None]] = -np.inf
+
+        # Enough candidates per row to skip every outfit the earlier selections may take.
+        depth = min(len(selected) * k + k, scores.shape[1])
+        top = np.argpartition(-scores, depth - 1, axis=1)[:, :depth]
+        order = np.argsort(-np.take_along_axis(scores, top, axis=1), axis=1)
+        top = np.take_along_axis(top, order, axis=1)
+
+        taken = set()
+        for row, i in enumerate(known):
+            picks = [j for j in top[row] if np.isfinite(scores[row, j]) and j not in taken][:k]
+            taken.update(picks)
+            results[i] = [str(self.clothes.paths[j]) for j in picks]
+        return results
+
+
+# Function to open the offline-built indexes, or None if they have not been built yet.
+def load_recommender(directory=INDEX_DIR):
+    if not all(os.path.exists(path) for root in ('images', 'clothes') for path in index_files(root, directory).values()):
+        return None
+    return OutfitRecommender(FeatureIndex('images', directory), FeatureIndex('clothes', directory))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Build the color feature indexes used to recommend outfits.')
+    parser.add_argument('--workers', type=int, help='Threads computing features.')
+    args = parser.parse_args()
+
+    catalog = ImageCatalog(workers=args.workers)
+    catalog.update(('images', 'clothes'))
+    for root in ('images', 'clothes'):
+        computed = build_index(catalog, root, workers=args.workers)
+        print(f'{root}: {len(FeatureIndex(root))} images indexed, {computed} computed')
+    catalog.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,100 @@
+from collections import OrderedDict
+
+import cv2
+import numpy as np
+
+
+# Premultiplied-alpha sprite ready for compositing.
+class OverlaySprite:
+    __slots__ = ('color', 'inv_alpha', 'width', 'height')
+
+    def __init__(self, color, inv_alpha):
+        self.color = color
+        self.inv_alpha = inv_alpha
+        self.height, self.width = color.shape[:2]
+
+
+# Function to premultiply a BGRA image into a sprite.
+def premultiply(image):
+    if image.shape[2] == 3:
+        alpha = np.full(image.shape[:2], 255, dtype=np.uint8)
+    else:
+        alpha = image[:, :, 3]
+    color = cv2.multiply(image[:, :, :3], cv2.merge([alpha, alpha, alpha]), scale=1 / 255.0)
+    # Inverse alpha is kept as (h, w, 1) uint16 so blending broadcasts without a cast.
+    inv_alpha = (255 - alpha).astype(np.uint16)[:, :, None]
+    return OverlaySprite(color, inv_alpha)
+
+
+# Cache of premultiplied accessory images, bucketed by output width and evicted by LRU. Buckets are a few
+# pixels wide whatever the size of the source, so a sprite never jumps by more than that as the face moves.
+class OverlayAssetCache:
+    def __init__(self, max_entries=64, width_step=2):
+        self.max_entries = max_entries
+        self.width_step = width_step
+        self.sources = {}
+        self.entries = OrderedDict()
+
+    # A missing image is reported once and its overlay is skipped, so the try-on still runs without it.
+    def add(self, name, image):
+        if image is None:
+            print(f"Overlay image '{name}' could not be loaded; it will not be drawn.")
+            self.sources.pop(name, None)
+        else:
+            self.sources[name] = image
+        for key in [key for key in self.entries if key[0] == name]:
+            del self.entries[key]
+
+    def quantize(self, width):
+        return max(1, int(round(width / self.width_step)))
+
+    # Returns None for an overlay whose image is missing.
+    def get(self, name, scale=1):
+        if name not in self.sources:
+            return None
+        return self.get_width(name, self.sources[name].shape[1] * scale)
+
+    # Get a sprite whose width is as close as possible to the requested pixel width.
+    def get_width(self, name, width):
+        if name not in self.sources:
+            return None
+        key = (name, self.quantize(width))
+        sprite = self.entries.get(key)
+        if sprite is not None:
+            self.entries.move_to_end(key)
+            return sprite
+
+        source = self.sources[name]
+        width = key[1] * self.width_step
+        scale = width / source.shape[1]
+        height = max(1, int(round(source.shape[0] * scale)))
+        interpolation = cv2.INTER_AREA if scale < 1 else cv2.INTER_LINEAR
+        sprite = premultiply(cv2.resize(source, (width, height), interpolation=interpolation))
+
+        self.entries[key] = sprite
+        if len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+        return sprite
+
+
+# Function to blend a premultiplied sprite onto the background with its top-left corner at (x, y).
+def composite(background, sprite, x, y):
+    rows, cols = background.shape[:2]
+    x1, y1 = max(0, x), max(0, y)
+    x2, y2 = min(cols, x + sprite.width), min(rows, y + sprite.height)
+    if x1 >= x2 or y1 >= y2:
+        return background
+
+    roi = background[y1:y2, x1:x2]
+    sx1, sy1 = x1 - x, y1 - y
+    sx2, sy2 = sx1 + (x2 - x1), sy1 + (y2 - y1)
+
+    # dst = src + dst * (255 - a) / 255, with the division done in 16-bit fixed point.
+    blended = roi.astype(np.uint16)
+    blended *= sprite.inv_alpha[sy1:sy2, sx1:sx2]
+    blended += 128
+    blended += blended >> 8
+    blended >>= 8
+    blended += sprite.color[sy1:sy2, sx1:sx2]
+    roi[...] = blended
+    return background
@@ -0,0 +1,91 @@
+import argparse
+import os
+import random
+import tempfile
+import threading
+import time
+import uuid
+
+import numpy as np
+
+from reservation_store import CONFIRMED, ReservationStore
+
+
+# Function to run one client: reserve one item at a time, waiting for each result like a kiosk would.
+# Some requests are sent twice with the same id, as a client retrying after a timeout does.
+def run_client(store, products, requests, retry_fraction, latencies, outcomes, seed):
+    rng = random.Random(seed)
+    for _ in range(requests):
+        reservation_id = uuid.uuid4().hex
+        attempts = 2 if rng.random() < retry_fraction else 1
+        for _ in range(attempts):
+            start = time.perf_counter()
+            result = store.reserve(rng.choice(products), f'client-{seed}', reservation_id=reservation_id).result()
+            latencies.append(time.perf_counter() - start)
+        outcomes.append((reservation_id, result.status))
+
+
+# Function to run the load test against a fresh database and return its figures.
+def run_load(path, clients, requests, products, stock, retry_fraction=0.0, max_batch=512, max_wait=0.0):
+    product_ids = [f'product-{i}' for i in range(products)]
+    store = ReservationStore(path, max_batch=max_batch, max_wait=max_wait)
+    store.add_products({product_id: stock for product_id in product_ids}).result()
+
+    latencies, outcomes = [], []
+    threads = [threading.Thread(target=run_client,
+                                args=(store, product_ids, requests, retry_fraction, latencies, outcomes, i))
+               for i in range(clients)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    store.close()
+
+    inventory = store.inventory()
+    confirmed = sum(status == CONFIRMED for _, status in outcomes)
+    reserved = sum(counters['reserved'] for counters in inventory.values())
+    latencies = np.asarray(latencies) * 1000
+    return {
+        'requests': len(latencies),
+        'reservations': len(outcomes),
+        'confirmed': confirmed,
+        'reserved': reserved,
+        'oversold': any(counters['available'] < 0 for counters in inventory.values()) or reserved > products * stock,
+        'per_second': len(latencies) / elapsed,
+        'p50_ms': float(np.percentile(latencies, 50)),
+        'p95_ms': float(np.percentile(latencies, 95)),
+        'p99_ms': float(np.percentile(latencies, 99)),
+        'commits': store.commits,
+        'batch_size': store.committed_requests / max(store.commits, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Load test of the pre-booking reservation store.')
+    parser.add_argument('--clients', type=int, nargs='+', default=[1, 8, 32, 128], help='Concurrent clients per run.')
+    parser.add_argument('--requests', type=int, default=200, help='Reservations per client.')
+    parser.add_argument('--products', type=int, default=2)
+    parser.add_argument('--stock', type=int, default=5000, help='Initial stock of each product.')
+    parser.add_argument('--retry-fraction', type=float, default=0.05,
+                        help='Share of reservations sent twice with the same id.')
+    parser.add_argument('--max-batch', type=int, default=512, help='Requests per transaction; 1 disables group commit.')
+    parser.add_argument('--max-wait', type=float, default=0.0, help='Seconds the writer waits to fill a batch.')
+    args = parser.parse_args()
+
+    print(f"{'clients':>7} {'req/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'commits':>8} {'batch':>6} "
+          f"{'confirmed':>9}  oversold")
+    with tempfile.TemporaryDirectory() as directory:
+        for clients in args.clients:
+            result = run_load(os.path.join(directory, f'reservations-{clients}.sqlite'), clients, args.requests,
+                              args.products, args.stock, args.retry_fraction, args.max_batch, args.max_wait)
+            print(f"{clients:>7} {result['per_second']:>9.0f} {result['p50_ms']:>8.2f} {result['p95_ms']:>8.2f} "
+                  f"{result['p99_ms']:>8.2f} {result['commits']:>8} {result['batch_size']:>6.1f} "
+                  f"{result['confirmed']:>9}  {'YES' if result['oversold'] else 'no'}")
+            if result['confirmed'] != result['reserved']:
+                print(f"  mismatch: {result['confirmed']} confirmed but {result['reserved']} reserved")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,206 @@
+import numbers
+import queue
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import Future
+
+RESERVATIONS_DB = 'reservations.sqlite'
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS inventory (
+    product_id TEXT PRIMARY KEY,
+    available INTEGER NOT NULL CHECK (available >= 0),
+    reserved INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS reservations (
+    reservation_id TEXT PRIMARY KEY,
+    product_id TEXT NOT NULL,
+    customer_id TEXT,
+    quantity INTEGER NOT NULL,
+    status TEXT NOT NULL,
+    created_at REAL NOT NULL
+);
+"""
+
+CONFIRMED = 'confirmed'
+SOLD_OUT = 'sold_out'
+UNKNOWN_PRODUCT = 'unknown_product'
+
+
+# Outcome of one reservation request. A request repeated with the same reservation id gets the same outcome.
+class ReservationResult:
+    def __init__(self, reservation_id, product_id, status, remaining=None):
+        self.reservation_id = reservation_id
+        self.product_id = product_id
+        self.status = status
+        self.remaining = remaining
+
+    @property
+    def confirmed(self):
+        return self.status == CONFIRMED
+
+    def __repr__(self):
+        return f'ReservationResult({self.reservation_id!r}, {self.product_id!r}, {self.status!r}, {self.remaining!r})'
+
+
+# Function to open the store's database. WAL keeps readers from blocking the writer and the other way round.
+def connect(path):
+    connection = sqlite3.connect(path, timeout=10.0, isolation_level=None, check_same_thread=False)
+    connection.execute('PRAGMA journal_mode=WAL')
+    connection.execute('PRAGMA synchronous=NORMAL')
+    connection.executescript(SCHEMA)
+    return connection
+
+
+# Reservation store with group commit. Callers get a Future right away; a single writer thread takes every
+# request waiting in the queue and applies them in one IMMEDIATE transaction, checking stock inside it, so
+# concurrent launches cannot oversell and thousands of requests cost a handful of commits. Each request runs
+# in its own savepoint, so one that fails does not take the rest of its batch with it.
+class ReservationStore:
+    def __init__(self, path=RESERVATIONS_DB, max_batch=512, max_wait=0.0):
+        self.path = path
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.requests = queue.Queue()
+        # Guards closed against requests queued while close() is queueing the writer's stop marker.
+        self.lock = threading.Lock()
+        self.closed = False
+        self.commits = 0
+        self.committed_requests = 0
+        self.thread = threading.Thread(target=self.run, name='reservation-writer', daemon=True)
+        self.thread.start()
+
+    # Function to request a reservation. Pass the same reservation_id when retrying so it is booked once.
+    def reserve(self, product_id, customer_id=None, quantity=1, reservation_id=None):
+        if isinstance(quantity, bool) or not isinstance(quantity, numbers.Integral):
+            raise TypeError(f'Quantity must be a whole number, not {quantity!r}.')
+        if quantity < 1:
+            raise ValueError(f'Cannot reserve a quantity of {quantity}.')
+        request = (reservation_id or uuid.uuid4().hex, product_id, customer_id, int(quantity))
+        return self.submit('reserve', request)
+
+    # Function to add products with their stock; products that already exist keep their counters.
+    def add_products(self, stock):
+        return self.submit('stock', dict(stock))
+
+    # Function to queue a request for the writer. Nothing would ever answer it once the store is closed.
+    def submit(self, kind, request):
+        future = Future()
+        with self.lock:
+            if self.closed:
+                raise RuntimeError('The reservation store is closed.')
+            self.requests.put((kind, request, future))
+        return future
+
+    # Function to read the counters of every product, on a connection of its own.
+    def inventory(self):
+        connection = connect(self.path)
+        try:
+            return {product_id: {'available': available, 'reserved': reserved} for product_id, available, reserved in
+                    connection.execute('SELECT product_id, available, reserved FROM inventory')}
+        finally:
+            connection.close()
+
+    def run(self):
+        connection = None
+        while True:
+            batch = [self.requests.get()]
+            # Everything that queued up while the previous batch was committing joins this one. A max_wait trades
+            # latency for bigger batches when the disk, not the queue, is the bottleneck.
+            deadline = time.monotonic() + self.max_wait
+            while len(batch) < self.max_batch and batch[-1] is not None:
+                try:
+                    batch.append(self.requests.get(timeout=max(deadline - time.monotonic(), 0)))
+                except queue.Empty:
+                    break
+            stop = batch[-1] is None
+            batch = [item for item in batch if item is not None]
+            if batch:
+                try:
+                    if connection is None:
+                        connection = connect(self.path)
+                    self.commit(connection, batch)
+                except Exception as e:
+                    # The batch failed as a whole, e.g. the database could not be opened. The writer keeps
+                    # running and reconnects for the next batch.
+                    for _, _, future in batch:
+                        if not future.done():
+                            future.set_exception(e)
+                    if connection is not None:
+                        connection.close()
+                        connection = None
+            if stop:
+                break
+        if connection is not None:
+            connection.close()
+
+    def commit(self, connection, batch):
+        outcomes = []
+        try:
+            # Fails with "database is locked" when another kiosk holds the file past the busy timeout.
+            connection.execute('BEGIN IMMEDIATE')
+            for kind, request, _ in batch:
+                connection.execute('SAVEPOINT request')
+                try:
+                    outcomes.append((self.apply(connection, kind, request), None))
+                except Exception as e:
+                    connection.execute('ROLLBACK TO request')
+                    outcomes.append((None, e))
+                connection.execute('RELEASE request')
+            connection.execute('COMMIT')
+        except Exception as e:
+            if connection.in_transaction:
+                connection.execute('ROLLBACK')
+            for _, _, future in batch:
+                future.set_exception(e)
+            return
+        self.commits += 1
+        self.committed_requests += len(batch)
+        for (_, _, future), (result, error) in zip(batch, outcomes):
+            if error is None:
+                future.set_result(result)
+            else:
+                future.set_exception(error)
+
+    # Called inside the batch transaction, so every check sees the effect of the requests before it.
+    def apply(self, connection, kind, request):
+        if kind == 'stock':
+            connection.executemany('INSERT OR IGNORE INTO inventory (product_id, available) VALUES (?, ?)',
+                                   request.items())
+            return None
+
+        reservation_id, product_id, customer_id, quantity = request
+        existing = connection.execute('SELECT product_id, status FROM reservations WHERE reservation_id = ?',
+                                      (reservation_id,)).fetchone()
+        if existing is not None:
+            # A replay reports the product the id was first booked for, whatever this request names.
+            product_id, status = existing
+            row = connection.execute('SELECT available FROM inventory WHERE product_id = ?', (product_id,)).fetchone()
+            return ReservationResult(reservation_id, product_id, status, row[0] if row else None)
+        row = connection.execute('SELECT available FROM inventory WHERE product_id = ?', (product_id,)).fetchone()
+        if row is None:
+            return ReservationResult(reservation_id, product_id, UNKNOWN_PRODUCT)
+
+        status = CONFIRMED if row[0] >= quantity else SOLD_OUT
+        if status == CONFIRMED:
+            connection.execute('UPDATE inventory SET available = available - ?, reserved = reserved + ? '
+                               'WHERE product_id = ?', (quantity, quantity, product_id))
+        connection.execute('INSERT INTO reservations VALUES (?, ?, ?, ?, ?, ?)',
+                           (reservation_id, product_id, customer_id, quantity, status, time.time()))
+        return ReservationResult(reservation_id, product_id, status, row[0] - quantity if status == CONFIRMED else row[0])
+
+    def close(self, timeout=10.0):
+        with self.lock:
+            if not self.closed:
+                self.closed = True
+                self.requests.put(None)
+        self.thread.join(timeout)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+        return False
@@ -0,0 +1,53 @@
+import cv2
+import numpy as np
+
+
+# Function to get a padded pixel box (x0, y0, x1, y1) around normalized landmark arrays.
+def landmark_box(point_arrays, width, height, margin=0.3, min_size=32):
+    points = np.concatenate([points[:, :2] for points in point_arrays])
+    (x_min, y_min), (x_max, y_max) = points.min(axis=0), points.max(axis=0)
+    pad = margin * max((x_max - x_min) * width, (y_max - y_min) * height)
+    x0 = max(0, int(x_min * width - pad))
+    y0 = max(0, int(y_min * height - pad))
+    x1 = min(width, int(x_max * width + pad) + 1)
+    y1 = min(height, int(y_max * height + pad) + 1)
+    if x1 - x0 < min_size or y1 - y0 < min_size:
+        return None
+    return x0, y0, x1, y1
+
+
+# Function to tell whether pixel box `outer` covers all of `inner`.
+def box_contains(outer, inner):
+    return outer[0] <= inner[0] and outer[1] <= inner[1] and outer[2] >= inner[2] and outer[3] >= inner[3]
+
+
+# RGB model input cut from a region of a BGR frame and downscaled to at most max_side pixels.
+class RegionInput:
+    def __init__(self, frame, box=None, max_side=None):
+        self.frame_height, self.frame_width = frame.shape[:2]
+        self.box = box or (0, 0, self.frame_width, self.frame_height)
+        x0, y0, x1, y1 = self.box
+        crop = frame[y0:y1, x0:x1]
+
+        # Downscale before the color conversion so both only touch the pixels the model sees.
+        longest = max(x1 - x0, y1 - y0)
+        if max_side and longest > max_side:
+            scale = max_side / longest
+            crop = cv2.resize(crop, (max(1, int((x1 - x0) * scale)), max(1, int((y1 - y0) * scale))),
+                              interpolation=cv2.INTER_AREA)
+        self.rgb = cv2.cvtColor(crop, cv2.COLOR_BGR2RGB)
+
+    @property
+    def is_full_frame(self):
+        return self.box == (0, 0, self.frame_width, self.frame_height)
+
+    # Function to map normalized region landmarks back to normalized full-frame coordinates.
+    def to_frame(self, points):
+        if self.is_full_frame:
+            return points
+        x0, y0, x1, y1 = self.box
+        mapped = points.copy()
+        mapped[:, 0] = (points[:, 0] * (x1 - x0) + x0) / self.frame_width
+        mapped[:, 1] = (points[:, 1] * (y1 - y0) + y0) / self.frame_height
+        mapped[:, 2] = points[:, 2] * (x1 - x0) / self.frame_width
+        return mapped
@@ -0,0 +1,100 @@
+import numpy as np
+
+LOD_MODES = ('lttb', 'minmax')
+
+
+# Function to split `count` points into equal buckets, padding the last one. Returns (padded index grid, valid mask).
+def bucket_grid(start, count, buckets):
+    size = -(-count // buckets)
+    grid = start + np.arange(buckets * size).reshape(buckets, size)
+    valid = grid < start + count
+    return grid, valid
+
+
+# Function to pick about n_out indices with Largest-Triangle-Three-Buckets. Every bucket is scored at once,
+# with the previous bucket's mean standing in for the previously selected point.
+def lttb_indices(x, y, n_out):
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+
+    buckets = n_out - 2
+    grid, valid = bucket_grid(1, n - 2, buckets)
+    safe = np.where(valid, grid, 0)
+    bucket_x = np.where(valid, x[safe], np.nan)
+    bucket_y = np.where(valid, y[safe], np.nan)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean_x = np.nansum(bucket_x, axis=1) / (~np.isnan(bucket_x)).sum(axis=1)
+        mean_y = np.nansum(bucket_y, axis=1) / (~np.isnan(bucket_y)).sum(axis=1)
+
+    # Triangle corners: the previous bucket (first point for bucket 0) and the next one (last point at the end).
+    previous_x = np.concatenate([[x[0]], mean_x[:-1]])
+    previous_y = np.concatenate([[y[0]], mean_y[:-1]])
+    next_x = np.concatenate([mean_x[1:], [x[-1]]])
+    next_y = np.concatenate([mean_y[1:], [y[-1]]])
+
+    area = np.abs((previous_x - next_x)[:, None] * (bucket_y - previous_y[:, None]) -
+                  (previous_x[:, None] - bucket_x) * (next_y - previous_y)[:, None])
+    area = np.where(np.isnan(area), -1.0, area)
+    chosen = grid[np.arange(buckets), area.argmax(axis=1)]
+    chosen = chosen[chosen < n - 1]
+    return np.concatenate([[0], chosen, [n - 1]])
+
+
+# Function to keep the minimum and maximum of each bucket, about n_out indices in total.
+def minmax_indices(x, y, n_out):
+    n = len(y)
+    if n_out >= n or n_out < 4:
+        return np.arange(n)
+
+    grid, valid = bucket_grid(0, n, n_out // 2)
+    values = np.where(valid, y[np.where(valid, grid, 0)], np.nan)
+    nan = np.isnan(values)
+    rows = np.arange(len(grid))
+    lows = grid[rows, np.where(nan, np.inf, values).argmin(axis=1)]
+    highs = grid[rows, np.where(nan, -np.inf, values).argmax(axis=1)]
+    kept = np.concatenate([lows, highs, [0, n - 1]])
+    return np.unique(kept[kept < n])
+
+
+DOWNSAMPLERS = {
+    'lttb': lttb_indices,
+    'minmax': minmax_indices,
+}
+
+
+# Function to downsample a series to at most about n_out points. Returns the kept indices.
+def downsample(x, y, n_out, mode='lttb'):
+    return DOWNSAMPLERS[mode](np.asarray(x, dtype=float), np.asarray(y, dtype=float), n_out)
+
+
+# Precomputed levels of detail of a series, each about `factor` times coarser than the one before.
+# Levels hold indices into the full series, so any index range maps onto every level with a searchsorted.
+class LodPyramid:
+    def __init__(self, x, y, mode='lttb', factor=4, min_points=256):
+        if mode not in DOWNSAMPLERS:
+            raise ValueError(f"Unknown downsampling mode '{mode}', expected one of {LOD_MODES}.")
+        self.x = np.asarray(x, dtype=float)
+        self.y = np.asarray(y, dtype=float)
+        self.mode = mode
+        self.levels = [np.arange(len(self.x))]
+        while len(self.levels[-1]) // factor >= min_points:
+            previous = self.levels[-1]
+            kept = DOWNSAMPLERS[mode](self.x[previous], self.y[previous], len(previous) // factor)
+            self.levels.append(previous[kept])
+
+    # Function to get the indices of the finest level with at most max_points points in rows [start, stop).
+    def select(self, start, stop, max_points):
+        for level in self.levels:
+            low, high = np.searchsorted(level, [start, stop])
+            if high - low <= max_points:
+                return level[low:high]
+        # Even the coarsest level is too dense for this range: thin its slice on the fly.
+        indices = level[low:high]
+        return indices[DOWNSAMPLERS[self.mode](self.x[indices], self.y[indices], max_points)]
+
+    # Function to select by an x range instead of rows, for series with increasing x.
+    def select_x(self, x_min, x_max, max_points, stop=None):
+        start, end = np.searchsorted(self.x, [x_min, x_max], side='left')
+        end = min(end + 1, len(self.x) if stop is None else stop)
+        return self.select(max(start - 1, 0), end, max_points)
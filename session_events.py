@@ -0,0 +1,168 @@
+import argparse
+import csv
+import sqlite3
+import threading
+import time
+import uuid
+
+EVENTS_DB = 'session_events.sqlite'
+# Events kept in memory while the database cannot be written; the oldest are dropped beyond this.
+MAX_BUFFERED_EVENTS = 10_000
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS events (
+    id INTEGER PRIMARY KEY,
+    session_id TEXT NOT NULL,
+    timestamp REAL NOT NULL,
+    event TEXT NOT NULL,
+    path TEXT,
+    category TEXT
+);
+CREATE INDEX IF NOT EXISTS events_by_session ON events (session_id, timestamp);
+"""
+
+
+# Function to open the event database. WAL lets several kiosks append to one file without blocking readers.
+def connect(path):
+    # IMMEDIATE transactions take the write lock up front, so a busy database is waited on instead of failing.
+    connection = sqlite3.connect(path, timeout=10.0, isolation_level='IMMEDIATE')
+    connection.execute('PRAGMA journal_mode=WAL')
+    connection.execute('PRAGMA synchronous=NORMAL')
+    connection.executescript(SCHEMA)
+    return connection
+
+
+# Session event log. log() only appends to an in-memory buffer; a background thread writes the buffer in one
+# transaction once it holds batch_size events, every flush_interval seconds, and on close().
+class SessionEventLog:
+    def __init__(self, path=EVENTS_DB, batch_size=64, flush_interval=2.0):
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.session_id = uuid.uuid4().hex
+        self.buffer = []
+        self.lock = threading.Lock()
+        self.wakeup = threading.Event()
+        self.closed = False
+        self.error = None
+        self.dropped = 0
+        self.thread = threading.Thread(target=self.run, name='session-events', daemon=True)
+        self.thread.start()
+        self.log('session_start')
+
+    # True while the database cannot be written. Events stay buffered, up to MAX_BUFFERED_EVENTS, and the
+    # flusher keeps retrying.
+    @property
+    def failed(self):
+        return self.error is not None
+
+    def log(self, event, path=None, category=None):
+        with self.lock:
+            if self.error is not None and len(self.buffer) >= MAX_BUFFERED_EVENTS:
+                del self.buffer[0]
+                self.dropped += 1
+            self.buffer.append((self.session_id, time.time(), event, path, category))
+            full = len(self.buffer) >= self.batch_size
+        if full:
+            self.wakeup.set()
+
+    # Function to end the current session and start a new one, e.g. when the kiosk is restarted for the next user.
+    def new_session(self):
+        self.log('session_end')
+        self.session_id = uuid.uuid4().hex
+        self.log('session_start')
+
+    def run(self):
+        connection = None
+        while not self.closed:
+            self.wakeup.wait(self.flush_interval)
+            self.wakeup.clear()
+            connection, _ = self.flush(connection)
+        # Events logged while the last batch was being written are still buffered.
+        deadline = time.monotonic() + self.flush_interval
+        while True:
+            connection, written = self.flush(connection)
+            if written or time.monotonic() >= deadline:
+                break
+            time.sleep(0.05)
+        if connection is not None:
+            connection.close()
+
+    # Function to write the buffered events, opening the database first if needed. Returns the connection to
+    # use next time, None after a failure so it is reopened, and whether everything was written.
+    def flush(self, connection):
+        try:
+            if connection is None:
+                connection = connect(self.path)
+            self.write_pending(connection)
+        except Exception as e:
+            if self.error is None:
+                print(f"Session events could not be written to {self.path}, will retry: {e}")
+            self.error = e
+            if connection is not None:
+                connection.close()
+            return None, False
+        if self.error is not None:
+            print(f"Session events are being written to {self.path} again.")
+            self.error = None
+        return connection, True
+
+    # Function to write the buffered events in one transaction. On failure they are kept for the next flush.
+    def write_pending(self, connection):
+        with self.lock:
+            batch, self.buffer = self.buffer, []
+        if not batch:
+            return
+        try:
+            with connection:
+                connection.executemany('INSERT INTO events (session_id, timestamp, event, path, category) '
+                                       'VALUES (?, ?, ?, ?, ?)', batch)
+        except Exception:
+            # E.g. another kiosk held the database for longer than the timeout.
+            with self.lock:
+                self.buffer[:0] = batch
+                overflow = len(self.buffer) - MAX_BUFFERED_EVENTS
+                if overflow > 0:
+                    del self.buffer[:overflow]
+                    self.dropped += overflow
+            raise
+
+    # Function to write what is left and stop the flusher.
+    def close(self, timeout=5.0):
+        if self.closed:
+            return
+        self.log('session_end')
+        self.closed = True
+        self.wakeup.set()
+        self.thread.join(timeout)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Export logged session events to CSV.')
+    parser.add_argument('output', help='CSV file to write.')
+    parser.add_argument('--database', default=EVENTS_DB)
+    parser.add_argument('--session', help='Only export this session id.')
+    parser.add_argument('--event', help="Only export this event type, e.g. 'select'.")
+    args = parser.parse_args()
+
+    query = 'SELECT session_id, timestamp, event, path, category FROM events'
+    conditions, parameters = [], []
+    if args.session:
+        conditions.append('session_id = ?')
+        parameters.append(args.session)
+    if args.event:
+        conditions.append('event = ?')
+        parameters.append(args.event)
+    if conditions:
+        query += ' WHERE ' + ' AND '.join(conditions)
+
+    connection = connect(args.database)
+    with open(args.output, 'w', newline='') as file:
+        writer = csv.writer(file)
+        writer.writerow(['Session', 'Timestamp', 'Event', 'Image Path', 'Category'])
+        writer.writerows(connection.execute(query + ' ORDER BY id', parameters))
+    connection.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,116 @@
+import itertools
+import queue
+import threading
+from collections import OrderedDict
+
+import cv2
+from kivy.clock import Clock
+from kivy.graphics.texture import Texture
+from kivy.uix.behaviors import ButtonBehavior
+from kivy.uix.image import Image
+
+# Priorities of decode requests: tiles waiting on screen go before speculative prefetches.
+NEEDED, PREFETCH = 0, 1
+
+
+# Function to decode an image file into bottom-up RGBA bytes ready for a Kivy texture. Returns (size, bytes) or None.
+def decode_rgba(path):
+    image = cv2.imread(path, cv2.IMREAD_UNCHANGED)
+    if image is None:
+        return None
+    if image.ndim == 2:
+        image = cv2.cvtColor(image, cv2.COLOR_GRAY2RGBA)
+    elif image.shape[2] == 3:
+        image = cv2.cvtColor(image, cv2.COLOR_BGR2RGBA)
+    else:
+        image = cv2.cvtColor(image, cv2.COLOR_BGRA2RGBA)
+    # Kivy textures start at the bottom row.
+    image = cv2.flip(image, 0)
+    return (image.shape[1], image.shape[0]), image.tobytes()
+
+
+# Decodes images on a background thread and hands them to the UI as textures from a bounded LRU cache.
+# Textures are only ever created on the main thread, from Clock callbacks.
+class TexturePrefetcher:
+    def __init__(self, max_textures=64):
+        self.max_textures = max_textures
+        self.textures = OrderedDict()
+        self.pending = {}
+        self.waiting = {}
+        self.requests = queue.PriorityQueue()
+        self.order = itertools.count()
+        self.thread = threading.Thread(target=self.run, name='texture-prefetch', daemon=True)
+        self.thread.start()
+
+    # Function to queue images for decoding without waiting for them, e.g. the next screen's candidates.
+    def prefetch(self, paths, priority=PREFETCH):
+        for path in paths:
+            if path in self.textures or self.pending.get(path, PREFETCH + 1) <= priority:
+                continue
+            self.pending[path] = priority
+            self.requests.put((priority, next(self.order), path))
+
+    # Function to get a texture as soon as it is ready: right away if cached, else once the worker has decoded it.
+    def request(self, path, callback):
+        texture = self.get(path)
+        if texture is not None:
+            callback(texture)
+            return
+        self.waiting.setdefault(path, []).append(callback)
+        self.prefetch([path], NEEDED)
+
+    def get(self, path):
+        texture = self.textures.get(path)
+        if texture is not None:
+            self.textures.move_to_end(path)
+        return texture
+
+    def run(self):
+        while True:
+            _, _, path = self.requests.get()
+            if path is None:
+                break
+            decoded = decode_rgba(path)
+            Clock.schedule_once(lambda dt, path=path, decoded=decoded: self.deliver(path, decoded))
+
+    def deliver(self, path, decoded):
+        # A path queued twice (prefetched, then needed sooner) is only turned into a texture once.
+        if path not in self.pending:
+            return
+        del self.pending[path]
+        texture = None
+        if decoded is not None:
+            size, pixels = decoded
+            texture = Texture.create(size=size, colorfmt='rgba')
+            texture.blit_buffer(pixels, colorfmt='rgba', bufferfmt='ubyte')
+            self.textures[path] = texture
+            while len(self.textures) > self.max_textures:
+                self.textures.popitem(last=False)
+        for callback in self.waiting.pop(path, []):
+            callback(texture)
+
+    def stop(self):
+        self.requests.put((-1, next(self.order), None))
+
+
+# Clickable image tile that shows its texture once the prefetcher has it, instead of decoding on creation.
+class ImageTile(ButtonBehavior, Image):
+    def __init__(self, prefetcher, path, **kwargs):
+        super().__init__(fit_mode='fill', **kwargs)
+        self.path = path
+        # Transparent until the texture arrives, rather than a blank white box.
+        self.color = (1, 1, 1, 0)
+        prefetcher.request(path, self.set_texture)
+
+    def set_texture(self, texture):
+        if texture is not None:
+            self.texture = texture
+            self.update_color()
+
+    # Dim the tile once it is selected, as a disabled button would be.
+    def on_disabled(self, instance, disabled):
+        self.update_color()
+
+    def update_color(self):
+        if self.texture is not None:
+            self.color = (1, 1, 1, 0.5 if self.disabled else 1)
@@ -0,0 +1,147 @@
+import threading
+import time
+
+import cv2
+from kivy.app import App
+from kivy.clock import Clock
+from kivy.graphics.texture import Texture
+from kivy.uix.boxlayout import BoxLayout
+from kivy.uix.image import Image
+from kivy.uix.label import Label
+
+import glasses_and_nails_vr as tryon
+from vr_pipeline import run_pipeline
+
+# Seconds between attempts to restart while the last run still holds the camera, and how long to keep trying.
+RESTART_RETRY_SECONDS = 0.2
+RESTART_TIMEOUT_SECONDS = 5.0
+
+# Live glasses and nails try-on inside a Kivy window. Capture and inference run on the vr_pipeline threads;
+# only the newest annotated frame is handed to the main thread, where it is uploaded into one texture.
+class TryOnView(BoxLayout):
+    def __init__(self, camera=0, **kwargs):
+        super().__init__(orientation='vertical', **kwargs)
+        self.camera = camera
+        self.image = Image(fit_mode='contain')
+        self.status = Label(text='Loading try-on models...', size_hint=(1, None), height=30)
+        self.add_widget(self.image)
+        self.add_widget(self.status)
+        self.lock = threading.Lock()
+        self.pending = None
+        self.stop_event = threading.Event()
+        # Clear while a run holds the camera, from just before it is opened until the capture thread releases it.
+        self.camera_released = threading.Event()
+        self.camera_released.set()
+        self.camera_lock = threading.Lock()
+        self.thread = None
+        self.retry = None
+        self.started_at = None
+        self.first_frame_seconds = None
+
+    def start(self, waiting_since=None):
+        self.cancel_retry()
+        if self.thread is not None and self.thread.is_alive() and not self.stop_event.is_set():
+            return
+        with self.camera_lock:
+            camera_busy = not self.camera_released.is_set()
+        if camera_busy:
+            # The last run's capture thread still holds the camera; opening it again now would fail or share
+            # the device, so try again shortly, unless the device seems stuck.
+            waiting_since = waiting_since or time.perf_counter()
+            if time.perf_counter() - waiting_since > RESTART_TIMEOUT_SECONDS:
+                self.status.text = 'Camera still busy; leave and reopen the try-on to retry'
+                return
+            self.retry = Clock.schedule_once(lambda dt: self.start(waiting_since), RESTART_RETRY_SECONDS)
+            return
+        self.stop_event = threading.Event()
+        self.started_at = time.perf_counter()
+        self.first_frame_seconds = None
+        self.thread = threading.Thread(target=self.run, args=(self.stop_event,), name='tryon-view', daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.cancel_retry()
+        self.stop_event.set()
+
+    def cancel_retry(self):
+        if self.retry is not None:
+            self.retry.cancel()
+            self.retry = None
+
+    def run(self, stop_event):
+        tryon.warm_models()
+        # A run stopped during the warm-up never opens the camera, so a restart does not wait for it.
+        with self.camera_lock:
+            if stop_event.is_set():
+                return
+            self.camera_released.clear()
+        # The scheduler still carries landmarks and frame counters from the last run.
+        tryon.get_scheduler().reset()
+        cap = cv2.VideoCapture(self.camera)
+        if not cap.isOpened():
+            cap.release()
+            self.camera_released.set()
+            Clock.schedule_once(lambda dt: setattr(self.status, 'text', 'Camera not available'))
+            return
+
+        def render(frame, result):
+            frame = tryon.annotate(frame, result)
+            # Kivy textures start at the bottom row.
+            self.post(cv2.flip(frame, 0))
+            return True
+
+        # stop() ends the pipeline through stop_event even while no frames arrive. The pipeline's capture
+        # thread releases the camera once it has stopped reading and then sets camera_released.
+        try:
+            run_pipeline(cap, tryon.detect, render, stop_event=stop_event, released=self.camera_released)
+        except Exception as e:
+            print(f'try-on: pipeline stopped: {e!r}')
+            Clock.schedule_once(lambda dt: setattr(self.status, 'text', 'Try-on stopped after an error'))
+
+    # Function to hand a frame to the main thread. A frame still waiting there is replaced, never queued behind.
+    def post(self, frame):
+        with self.lock:
+            scheduled = self.pending is not None
+            self.pending = frame
+        if not scheduled:
+            Clock.schedule_once(self.show_frame)
+
+    def show_frame(self, dt):
+        with self.lock:
+            frame, self.pending = self.pending, None
+        if frame is None:
+            return
+        size = (frame.shape[1], frame.shape[0])
+        texture = self.image.texture
+        if texture is None or tuple(texture.size) != size:
+            texture = Texture.create(size=size, colorfmt='bgr')
+            self.image.texture = texture
+        texture.blit_buffer(frame.tobytes(), colorfmt='bgr', bufferfmt='ubyte')
+        self.image.canvas.ask_update()
+
+        if self.first_frame_seconds is None:
+            self.first_frame_seconds = time.perf_counter() - self.started_at
+            self.status.text = f'First frame after {self.first_frame_seconds * 1000:.0f} ms'
+            print(f'try-on: first frame {self.first_frame_seconds * 1000:.0f} ms after start')
+
+
+class LiveTryOnApp(App):
+    def build(self):
+        self.view = TryOnView()
+        self.view.start()
+        return self.view
+
+    # The launcher pauses a feature when leaving its screen; the camera is released until it comes back.
+    def on_pause(self):
+        self.view.stop()
+        return True
+
+    def on_resume(self):
+        self.view.start()
+
+    def on_stop(self):
+        self.view.stop()
+
+
+if __name__ == '__main__':
+    LiveTryOnApp().run()
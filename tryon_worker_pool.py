@@ -0,0 +1,352 @@
+import argparse
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from collections import deque
+
+import cv2
+
+# Message asking a worker to forget a session's tracking state.
+CLOSE_SESSION = 'close'
+
+
+# Function run in each worker process: owns a scheduler per session, each with its own MediaPipe graphs,
+# since tracking graphs carry state from one frame to the next and must never see another session's frames.
+def worker_main(worker_id, tasks, results, scheduler_options):
+    import glasses_and_nails_vr as tryon
+    from landmark_arrays import FrameLandmarks
+    from model_scheduler import ModelScheduler
+
+    schedulers = {}
+    results.put(('ready', worker_id))
+
+    while True:
+        task = tasks.get()
+        if task is None:
+            break
+        if task[0] == CLOSE_SESSION:
+            scheduler = schedulers.pop(task[1], None)
+            if scheduler is not None:
+                scheduler.close()
+            continue
+
+        session_id, frame_index, timestamp, frame = task
+        started = time.perf_counter_ns()
+        try:
+            scheduler = schedulers.get(session_id)
+            if scheduler is None:
+                scheduler = schedulers[session_id] = ModelScheduler(*tryon.create_models(), **scheduler_options)
+
+            result = scheduler.step(frame, now=timestamp)
+            measurements = tryon.measure(FrameLandmarks(result, frame.shape[1], frame.shape[0]))
+            frame = tryon.annotate(frame, result)
+        except Exception as e:
+            # Report the failed frame so the pool frees the session's slot; the worker keeps serving.
+            results.put(('error', worker_id, session_id, frame_index, repr(e), time.perf_counter_ns() - started))
+            continue
+        results.put(('frame', worker_id, session_id, frame_index, frame, measurements,
+                     time.perf_counter_ns() - started))
+
+
+# Per-session bookkeeping kept by the pool.
+class Session:
+    def __init__(self, session_id, worker_id, on_result):
+        self.session_id = session_id
+        self.worker_id = worker_id
+        self.on_result = on_result
+        self.pending = None
+        self.in_flight = 0
+        self.completed = 0
+        self.dropped = 0
+        self.errors = 0
+        self.opened_at = time.perf_counter()
+        self.recent = deque(maxlen=60)
+
+
+# Pool of worker processes serving try-on frames for many sessions.
+# Each session is pinned to one worker so its tracking state stays in one process; a session has at most
+# one frame in flight and only its newest waiting frame is kept, so every session gets an even share.
+# Sessions of a worker that dies are pinned to the remaining workers, starting from fresh tracking state.
+class TryOnPool:
+    def __init__(self, workers=None, scheduler_options=None):
+        self.worker_count = workers or os.cpu_count() or 1
+        context = multiprocessing.get_context('spawn')
+        self.results = context.Queue()
+        self.task_queues = [context.Queue() for _ in range(self.worker_count)]
+        self.processes = [
+            context.Process(target=worker_main, args=(i, self.task_queues[i], self.results, scheduler_options or {}),
+                            daemon=True)
+            for i in range(self.worker_count)
+        ]
+        self.sessions = {}
+        self.worker_sessions = [0] * self.worker_count
+        self.busy_ns = [0] * self.worker_count
+        self.dead_workers = set()
+        self.lock = threading.Lock()
+        self.slot_free = threading.Condition(self.lock)
+        self.started_at = None
+        self.running = False
+        self.collector = threading.Thread(target=self.collect, name='pool-results', daemon=True)
+
+    def start(self, timeout=60.0):
+        for process in self.processes:
+            process.start()
+        # Wait for every worker to import the models so startup is not counted as utilization.
+        ready = 0
+        while ready < self.worker_count:
+            message = self.results.get(timeout=timeout)
+            if message[0] == 'ready':
+                ready += 1
+        self.started_at = time.perf_counter()
+        self.running = True
+        self.collector.start()
+        return self
+
+    # Called with the lock held. Returns None once every worker has died.
+    def least_loaded_worker(self):
+        live = [i for i in range(self.worker_count) if i not in self.dead_workers]
+        return min(live, key=lambda i: self.worker_sessions[i]) if live else None
+
+    def open_session(self, session_id, on_result=None):
+        with self.lock:
+            worker_id = self.least_loaded_worker()
+            if worker_id is None:
+                raise RuntimeError('Every try-on worker has died.')
+            self.worker_sessions[worker_id] += 1
+            self.sessions[session_id] = Session(session_id, worker_id, on_result)
+        return worker_id
+
+    def close_session(self, session_id):
+        with self.lock:
+            session = self.sessions.pop(session_id, None)
+            if session is None:
+                return
+            self.worker_sessions[session.worker_id] -= 1
+            self.slot_free.notify_all()
+        self.task_queues[session.worker_id].put((CLOSE_SESSION, session_id))
+
+    # Submit a frame for a session. With block=False a waiting frame is replaced by the newer one.
+    def submit(self, session_id, frame_index, timestamp, frame, block=False):
+        with self.lock:
+            session = self.sessions[session_id]
+            while block and session.pending is not None and self.running:
+                self.slot_free.wait(timeout=0.1)
+            if session.pending is not None:
+                session.dropped += 1
+            session.pending = (session_id, frame_index, timestamp, frame)
+            self.dispatch(session)
+
+    # Called with the lock held.
+    def dispatch(self, session):
+        if session.in_flight or session.pending is None:
+            return
+        task, session.pending = session.pending, None
+        session.in_flight += 1
+        self.task_queues[session.worker_id].put(task)
+        self.slot_free.notify_all()
+
+    def collect(self):
+        checked_at = time.perf_counter()
+        while self.running:
+            if time.perf_counter() - checked_at > 0.5:
+                self.check_workers()
+                checked_at = time.perf_counter()
+            try:
+                message = self.results.get(timeout=0.1)
+            except queue.Empty:
+                continue
+            if message[0] == 'error':
+                _, worker_id, session_id, frame_index, error, busy_ns = message
+                print(f"Worker {worker_id} failed on frame {frame_index} of {session_id}: {error}")
+            elif message[0] != 'frame':
+                continue
+            else:
+                _, worker_id, session_id, frame_index, frame, measurements, busy_ns = message
+            with self.lock:
+                self.busy_ns[worker_id] += busy_ns
+                session = self.sessions.get(session_id)
+                if session is None or session.worker_id != worker_id:
+                    continue
+                session.in_flight -= 1
+                if message[0] == 'error':
+                    session.errors += 1
+                else:
+                    session.completed += 1
+                    session.recent.append(time.perf_counter())
+                self.dispatch(session)
+            if message[0] == 'frame' and session.on_result is not None:
+                session.on_result(session_id, frame_index, frame, measurements)
+
+    # Function to move the sessions of workers that have died to the live ones. Their frames in flight are lost.
+    def check_workers(self):
+        with self.lock:
+            for worker_id, process in enumerate(self.processes):
+                if worker_id in self.dead_workers or process.is_alive():
+                    continue
+                print(f"Worker {worker_id} exited with code {process.exitcode}; moving its sessions.")
+                self.dead_workers.add(worker_id)
+                self.worker_sessions[worker_id] = 0
+                for session in self.sessions.values():
+                    if session.worker_id != worker_id:
+                        continue
+                    new_worker = self.least_loaded_worker()
+                    if new_worker is None:
+                        continue
+                    session.worker_id = new_worker
+                    self.worker_sessions[new_worker] += 1
+                    session.dropped += session.in_flight
+                    session.in_flight = 0
+                    self.dispatch(session)
+            if len(self.dead_workers) == self.worker_count:
+                print("Every try-on worker has died.")
+                self.running = False
+            self.slot_free.notify_all()
+
+    # Function to report how busy each worker was and the frame rate of each session.
+    def stats(self):
+        now = time.perf_counter()
+        elapsed = max(now - (self.started_at or now), 1e-9)
+        with self.lock:
+            sessions = {}
+            for session_id, session in self.sessions.items():
+                recent = session.recent
+                rolling = 0.0
+                if len(recent) > 1 and recent[-1] > recent[0]:
+                    rolling = (len(recent) - 1) / (recent[-1] - recent[0])
+                sessions[session_id] = {
+                    'worker': session.worker_id,
+                    'completed': session.completed,
+                    'dropped': session.dropped,
+                    'errors': session.errors,
+                    'fps': rolling,
+                    'average_fps': session.completed / max(now - session.opened_at, 1e-9),
+                }
+            utilization = [busy / 1e9 / elapsed for busy in self.busy_ns]
+            dead_workers = sorted(self.dead_workers)
+        return {
+            'utilization': utilization,
+            'pool_utilization': sum(utilization) / len(utilization),
+            'dead_workers': dead_workers,
+            'sessions': sessions,
+        }
+
+    def shutdown(self):
+        self.running = False
+        with self.lock:
+            self.slot_free.notify_all()
+        for task_queue in self.task_queues:
+            task_queue.put(None)
+        for process in self.processes:
+            process.join(timeout=5.0)
+            if process.is_alive():
+                process.terminate()
+        if self.collector.is_alive():
+            self.collector.join(timeout=1.0)
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.shutdown()
+        return False
+
+
+# Feeds one video file into the pool as a session, paced at the video's frame rate.
+class VideoSession(threading.Thread):
+    def __init__(self, pool, session_id, path, output=None, realtime=True):
+        super().__init__(name=f'session-{session_id}', daemon=True)
+        self.pool = pool
+        self.session_id = session_id
+        self.path = path
+        self.output = output
+        self.realtime = realtime
+        self.fps = 30.0
+        self.writer = None
+        self.write_lock = threading.Lock()
+        self.last_measurements = {}
+
+    def on_result(self, session_id, frame_index, frame, measurements):
+        self.last_measurements = measurements
+        if self.output:
+            with self.write_lock:
+                if self.writer is None:
+                    height, width = frame.shape[:2]
+                    self.writer = cv2.VideoWriter(self.output, cv2.VideoWriter_fourcc(*'mp4v'), self.fps, (width, height))
+                self.writer.write(frame)
+
+    def run(self):
+        cap = cv2.VideoCapture(self.path)
+        self.fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+        self.pool.open_session(self.session_id, self.on_result)
+        started = time.perf_counter()
+        frame_index = 0
+        while cap.isOpened():
+            ret, frame = cap.read()
+            if not ret:
+                break
+            timestamp = frame_index / self.fps
+            if self.realtime:
+                delay = started + timestamp - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+            self.pool.submit(self.session_id, frame_index, timestamp, frame, block=not self.realtime)
+            frame_index += 1
+        cap.release()
+
+    def finish(self):
+        self.pool.close_session(self.session_id)
+        with self.write_lock:
+            if self.writer is not None:
+                self.writer.release()
+
+
+def main():
+    import glasses_and_nails_vr as tryon
+
+    parser = argparse.ArgumentParser(description='Serve try-on sessions from several video files on a worker pool.')
+    parser.add_argument('videos', nargs='+', help='One video file per simulated kiosk session.')
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help='Worker processes, one set of graphs each.')
+    parser.add_argument('--output-dir', help='Write each annotated session to a video in this directory.')
+    parser.add_argument('--as-fast-as-possible', action='store_true',
+                        help='Feed frames without pacing or dropping instead of at the video frame rate.')
+    parser.add_argument('--report-interval', type=float, default=5.0, help='Seconds between utilization reports.')
+    tryon.add_scheduler_arguments(parser)
+    args = parser.parse_args()
+
+    if args.output_dir:
+        os.makedirs(args.output_dir, exist_ok=True)
+
+    with TryOnPool(args.workers, tryon.scheduler_options(args)) as pool:
+        sessions = []
+        for i, path in enumerate(args.videos):
+            output = os.path.join(args.output_dir, f'session{i}.mp4') if args.output_dir else None
+            sessions.append(VideoSession(pool, f'session{i}', path, output, realtime=not args.as_fast_as_possible))
+        for session in sessions:
+            session.start()
+
+        while any(session.is_alive() for session in sessions):
+            for session in sessions:
+                session.join(timeout=args.report_interval / len(sessions))
+            print_stats(pool.stats())
+
+        # Let the last frames in flight come back before closing.
+        time.sleep(0.5)
+        print_stats(pool.stats())
+        for session in sessions:
+            session.finish()
+
+
+def print_stats(stats):
+    workers = ' '.join(f'{value:.0%}' for value in stats['utilization'])
+    print(f"pool utilization {stats['pool_utilization']:.0%} (workers: {workers})")
+    if stats['dead_workers']:
+        print(f"  dead workers: {', '.join(str(worker_id) for worker_id in stats['dead_workers'])}")
+    for session_id, session in stats['sessions'].items():
+        print(f"  {session_id} on worker {session['worker']}: {session['fps']:.1f} fps, "
+              f"{session['completed']} frames, {session['dropped']} dropped, {session['errors']} errors")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,85 @@
+import argparse
+import json
+import sys
+
+import glasses_and_nails_vr as tryon
+from vr_replay import open_source, replay
+from vr_timing import NULL_TIMER, StageTimer, format_summary
+
+# Scheduler settings compared by the benchmark, from every model on every frame to ROI tracking.
+CONFIGS = {
+    'baseline': argparse.Namespace(face_interval=1, hands_interval=1, pose_mode='always',
+                                   roi=False, roi_size=320, detect_size=640),
+    'scheduled': argparse.Namespace(face_interval=2, hands_interval=1, pose_mode='fallback',
+                                    roi=False, roi_size=320, detect_size=640),
+    'scheduled_roi': argparse.Namespace(face_interval=2, hands_interval=1, pose_mode='fallback',
+                                        roi=True, roi_size=320, detect_size=640),
+}
+
+
+# Function to benchmark one scheduler configuration over a source.
+def run_config(path, config, fps=30.0, warmup=10, max_frames=None):
+    tryon.configure_scheduler(config)
+    source = open_source(path, fps)
+    try:
+        # Untimed warm-up so graph initialization does not land in the percentiles.
+        replay(source, timer=NULL_TIMER, max_frames=warmup)
+        # replay() timestamps from zero again, so drop the warm-up tracks rather than extrapolate them backwards.
+        tryon.get_scheduler().reset()
+        timer = StageTimer()
+        replay(source, timer=timer, max_frames=max_frames)
+    finally:
+        source.release()
+    return timer.summary()
+
+
+# Function to list stages whose p95 latency grew by more than the tolerance against a previous run.
+def find_regressions(results, previous, tolerance):
+    regressions = []
+    for name, summary in results.items():
+        old_summary = previous.get(name)
+        if not old_summary:
+            continue
+        if summary['fps'] < old_summary['fps'] * (1 - tolerance):
+            regressions.append(f"{name}: fps {old_summary['fps']:.1f} -> {summary['fps']:.1f}")
+        for stage, stats in summary['stages'].items():
+            old_stats = old_summary['stages'].get(stage)
+            if old_stats and stats['p95_ms'] > old_stats['p95_ms'] * (1 + tolerance):
+                regressions.append(f"{name}/{stage}: p95 {old_stats['p95_ms']:.3f}ms -> {stats['p95_ms']:.3f}ms")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Per-stage latency benchmark of the try-on pipeline.')
+    parser.add_argument('input', help='Video file or directory of images.')
+    parser.add_argument('--configs', nargs='+', choices=list(CONFIGS), default=list(CONFIGS))
+    parser.add_argument('--fps', type=float, default=30.0, help='Frame rate assumed for image directories.')
+    parser.add_argument('--warmup', type=int, default=10, help='Frames to run before timing starts.')
+    parser.add_argument('--max-frames', type=int, help='Timed frames per configuration.')
+    parser.add_argument('--json', help='Write the results to this JSON file.')
+    parser.add_argument('--compare', help='Previous JSON results to check for regressions.')
+    parser.add_argument('--tolerance', type=float, default=0.1, help='Allowed slowdown before flagging, as a fraction.')
+    args = parser.parse_args()
+
+    results = {}
+    for name in args.configs:
+        results[name] = run_config(args.input, CONFIGS[name], args.fps, args.warmup, args.max_frames)
+        print(f"== {name}")
+        print(format_summary(results[name]))
+        print()
+
+    if args.json:
+        with open(args.json, 'w') as file:
+            json.dump(results, file, indent=2)
+
+    if args.compare:
+        with open(args.compare) as file:
+            regressions = find_regressions(results, json.load(file), args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
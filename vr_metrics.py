@@ -0,0 +1,141 @@
+import bisect
+import json
+import os
+import threading
+import time
+
+import cv2
+import numpy as np
+
+from vr_timing import StageSpan
+
+# Upper bounds of the latency histogram buckets, in milliseconds.
+BUCKET_BOUNDS_MS = (0.05, 0.1, 0.25, 0.5, 1, 2, 4, 8, 16, 33, 50, 100, 250, 500, 1000)
+BUCKET_BOUNDS_NS = [int(bound * 1e6) for bound in BUCKET_BOUNDS_MS]
+
+
+# Latency of one stage: the last `window` samples for percentiles, plus cumulative bucket counts.
+class StageStats:
+    __slots__ = ('window', 'position', 'buckets', 'count', 'total_ns')
+
+    def __init__(self, window_size):
+        self.window = np.zeros(window_size, dtype=np.int64)
+        self.position = 0
+        self.buckets = [0] * (len(BUCKET_BOUNDS_NS) + 1)
+        self.count = 0
+        self.total_ns = 0
+
+    def add(self, elapsed_ns):
+        self.window[self.position % len(self.window)] = elapsed_ns
+        self.position += 1
+        self.buckets[bisect.bisect_left(BUCKET_BOUNDS_NS, elapsed_ns)] += 1
+        self.count += 1
+        self.total_ns += elapsed_ns
+
+    def recent(self):
+        return self.window[:min(self.position, len(self.window))]
+
+
+# Low-overhead live metrics: rolling per-stage latency histograms and frame rate.
+class LiveMetrics:
+    def __init__(self, window_size=300):
+        self.window_size = window_size
+        self.stages = {}
+        self.frame_times = np.zeros(window_size, dtype=np.int64)
+        self.frames = 0
+        self.lock = threading.Lock()
+
+    def stage(self, name):
+        return StageSpan(self, name)
+
+    def record(self, name, elapsed_ns):
+        with self.lock:
+            stats = self.stages.get(name)
+            if stats is None:
+                stats = self.stages[name] = StageStats(self.window_size)
+            stats.add(elapsed_ns)
+
+    def frame_done(self):
+        with self.lock:
+            self.frame_times[self.frames % self.window_size] = time.perf_counter_ns()
+            self.frames += 1
+
+    def fps(self):
+        count = min(self.frames, self.window_size)
+        if count < 2:
+            return 0.0
+        newest = self.frame_times[(self.frames - 1) % self.window_size]
+        oldest = self.frame_times[(self.frames - count) % self.window_size]
+        return (count - 1) * 1e9 / (newest - oldest) if newest > oldest else 0.0
+
+    # Function to summarize the rolling window of every stage in milliseconds.
+    def snapshot(self):
+        with self.lock:
+            stages = {}
+            for name, stats in self.stages.items():
+                recent = stats.recent() / 1e6
+                p50, p95, p99 = np.percentile(recent, [50, 95, 99])
+                stages[name] = {
+                    'p50_ms': float(p50),
+                    'p95_ms': float(p95),
+                    'p99_ms': float(p99),
+                    'mean_ms': float(recent.mean()),
+                    'count': stats.count,
+                }
+            return {'time': time.time(), 'frames': self.frames, 'fps': self.fps(), 'stages': stages}
+
+    # Function to render the cumulative histograms in the Prometheus text exposition format.
+    def prometheus(self, prefix='tryon'):
+        with self.lock:
+            lines = [f'# TYPE {prefix}_fps gauge', f'{prefix}_fps {self.fps():.3f}',
+                     f'# TYPE {prefix}_frames_total counter', f'{prefix}_frames_total {self.frames}',
+                     f'# TYPE {prefix}_stage_seconds histogram']
+            for name, stats in self.stages.items():
+                cumulative = 0
+                for bound, count in zip(BUCKET_BOUNDS_MS, stats.buckets):
+                    cumulative += count
+                    lines.append(f'{prefix}_stage_seconds_bucket{{stage="{name}",le="{bound / 1000:g}"}} {cumulative}')
+                lines.append(f'{prefix}_stage_seconds_bucket{{stage="{name}",le="+Inf"}} {stats.count}')
+                lines.append(f'{prefix}_stage_seconds_sum{{stage="{name}"}} {stats.total_ns / 1e9:.6f}')
+                lines.append(f'{prefix}_stage_seconds_count{{stage="{name}"}} {stats.count}')
+        return '\n'.join(lines) + '\n'
+
+
+# Function to draw the frame rate and per-stage latency in the top-right corner of the frame.
+def draw_hud(frame, metrics):
+    snapshot = metrics.snapshot()
+    lines = [f"FPS {snapshot['fps']:.1f}"]
+    for name, stats in sorted(snapshot['stages'].items(), key=lambda item: -item[1]['p50_ms']):
+        lines.append(f"{name} {stats['p50_ms']:.1f}/{stats['p95_ms']:.1f} ms")
+
+    x = frame.shape[1] - 330
+    for i, line in enumerate(lines):
+        cv2.putText(frame, line, (x, 20 + 18 * i), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 255), 1, cv2.LINE_AA)
+    return frame
+
+
+# Periodically appends snapshots to a JSON lines file and rewrites a Prometheus text file.
+class MetricsExporter:
+    def __init__(self, metrics, jsonl_path=None, prometheus_path=None, interval=10.0):
+        self.metrics = metrics
+        self.jsonl_path = jsonl_path
+        self.prometheus_path = prometheus_path
+        self.interval = interval
+        self.next_export = time.monotonic() + interval
+
+    # Cheap enough to call every frame; only writes once the interval has passed.
+    def maybe_export(self):
+        if time.monotonic() >= self.next_export:
+            self.export()
+
+    def export(self):
+        self.next_export = time.monotonic() + self.interval
+        if self.jsonl_path:
+            with open(self.jsonl_path, 'a') as file:
+                file.write(json.dumps(self.metrics.snapshot()) + '\n')
+        if self.prometheus_path:
+            # Write then rename so a scraper never reads a half-written file.
+            temporary_path = self.prometheus_path + '.tmp'
+            with open(temporary_path, 'w') as file:
+                file.write(self.metrics.prometheus())
+            os.replace(temporary_path, self.prometheus_path)
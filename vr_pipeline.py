@@ -0,0 +1,143 @@
+import queue
+import threading
+import time
+
+from vr_timing import NULL_TIMER
+
+# Marker passed down the pipeline when a stage has finished.
+STOP = object()
+
+
+# Bounded queue joining two stages. When full it drops the oldest frame instead of blocking,
+# so a slow consumer always sees the most recent frame.
+class FrameQueue:
+    def __init__(self, depth=1, drop_stale=True):
+        self.queue = queue.Queue(maxsize=max(1, depth))
+        self.drop_stale = drop_stale
+        self.dropped = 0
+
+    def put(self, item, stop_event=None):
+        while True:
+            try:
+                if self.drop_stale:
+                    self.queue.put_nowait(item)
+                else:
+                    self.queue.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                if not self.drop_stale:
+                    if stop_event is not None and stop_event.is_set():
+                        return
+                    continue
+            try:
+                self.queue.get_nowait()
+                self.dropped += 1
+            except queue.Empty:
+                pass
+
+    def get(self, timeout=0.1):
+        return self.queue.get(timeout=timeout)
+
+
+# Stage that reads frames from the capture device as fast as it delivers them. It owns the device and
+# releases it itself, since a read may still be blocked when the rest of the pipeline has stopped.
+class CaptureStage(threading.Thread):
+    def __init__(self, cap, output, stop_event, timer=NULL_TIMER, released=None):
+        super().__init__(name='capture', daemon=True)
+        self.cap = cap
+        self.output = output
+        self.stop_event = stop_event
+        self.timer = timer
+        # Set once the device is released, which may be after run_pipeline has returned.
+        self.released = released if released is not None else threading.Event()
+        self.error = None
+
+    def run(self):
+        frame_id = 0
+        try:
+            while not self.stop_event.is_set() and self.cap.isOpened():
+                with self.timer.stage('capture'):
+                    ret, frame = self.cap.read()
+                if not ret:
+                    print("Failed to grab frame.")
+                    break
+                self.output.put((frame_id, time.perf_counter(), frame), self.stop_event)
+                frame_id += 1
+        except Exception as e:
+            # Kept for run_pipeline to raise on the calling thread.
+            self.error = e
+            self.stop_event.set()
+        finally:
+            self.cap.release()
+            self.released.set()
+            self.output.put(STOP, self.stop_event)
+
+
+# Stage that runs the models on the newest captured frame.
+class InferenceStage(threading.Thread):
+    def __init__(self, infer, source, output, stop_event):
+        super().__init__(name='inference', daemon=True)
+        self.infer = infer
+        self.source = source
+        self.output = output
+        self.stop_event = stop_event
+        self.error = None
+
+    def run(self):
+        try:
+            while not self.stop_event.is_set():
+                try:
+                    item = self.source.get()
+                except queue.Empty:
+                    continue
+                if item is STOP:
+                    break
+                frame_id, captured_at, frame = item
+                self.output.put((frame_id, captured_at, frame, self.infer(frame)), self.stop_event)
+        except Exception as e:
+            # Stops capture too; run_pipeline raises the error once both stages are done.
+            self.error = e
+            self.stop_event.set()
+        finally:
+            self.output.put(STOP, self.stop_event)
+
+
+# Function to run capture and inference on background threads and render on the calling thread.
+# render(frame, result) returns False to stop the pipeline; so does setting stop_event from another thread,
+# even while no frames arrive. The pipeline takes over cap and releases it, then sets `released` if given.
+# An exception raised by a stage is raised here once the pipeline has stopped.
+def run_pipeline(cap, infer, render, depth=1, drop_stale=True, timer=NULL_TIMER, stop_event=None, released=None):
+    if stop_event is None:
+        stop_event = threading.Event()
+    captured = FrameQueue(depth, drop_stale)
+    inferred = FrameQueue(depth, drop_stale)
+    stages = [
+        CaptureStage(cap, captured, stop_event, timer, released),
+        InferenceStage(infer, captured, inferred, stop_event),
+    ]
+    for stage in stages:
+        stage.start()
+
+    try:
+        while not stop_event.is_set():
+            try:
+                item = inferred.get()
+            except queue.Empty:
+                # Nothing more can arrive once the inference stage is gone, even if capture is still reading.
+                if not stages[-1].is_alive():
+                    break
+                continue
+            if item is STOP:
+                break
+            frame_id, captured_at, frame, result = item
+            if render(frame, result) is False:
+                break
+    finally:
+        stop_event.set()
+        for stage in stages:
+            stage.join(timeout=1.0)
+
+    for stage in stages:
+        if stage.error is not None:
+            raise stage.error
+    return captured.dropped + inferred.dropped
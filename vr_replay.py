@@ -0,0 +1,125 @@
+import argparse
+import os
+
+import cv2
+
+import glasses_and_nails_vr as tryon
+from landmark_recording import LandmarkRecorder
+from vr_timing import NULL_TIMER, StageTimer, format_summary
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.bmp')
+
+
+# Reads a directory of images in name order through the same interface as cv2.VideoCapture.
+class ImageDirectoryCapture:
+    def __init__(self, directory, fps=30.0):
+        self.paths = sorted(os.path.join(directory, f) for f in os.listdir(directory)
+                            if f.lower().endswith(IMAGE_EXTENSIONS))
+        self.fps = fps
+        self.position = 0
+
+    def isOpened(self):
+        return self.position < len(self.paths)
+
+    def read(self):
+        if self.position >= len(self.paths):
+            return False, None
+        frame = cv2.imread(self.paths[self.position])
+        self.position += 1
+        return frame is not None, frame
+
+    def get(self, prop):
+        if prop == cv2.CAP_PROP_FPS:
+            return self.fps
+        if prop == cv2.CAP_PROP_FRAME_COUNT:
+            return len(self.paths)
+        return 0
+
+    def release(self):
+        self.position = len(self.paths)
+
+
+# Function to open a recorded video file or an image directory.
+def open_source(path, fps=30.0):
+    if os.path.isdir(path):
+        return ImageDirectoryCapture(path, fps)
+    cap = cv2.VideoCapture(path)
+    if not cap.isOpened():
+        raise ValueError(f"Could not open video '{path}'.")
+    return cap
+
+
+# Function to run the try-on detection and overlay path over a source without a display.
+# Frames are timestamped from the source frame rate so tracking is independent of processing speed.
+def replay(source, output=None, timer=NULL_TIMER, max_frames=None, on_frame=None):
+    fps = source.get(cv2.CAP_PROP_FPS) or 30.0
+    scheduler = tryon.get_scheduler()
+    writer = None
+    frames = 0
+    scheduler.timer = timer
+    try:
+        while max_frames is None or frames < max_frames:
+            with timer.stage('decode'):
+                ret, frame = source.read()
+            if not ret:
+                break
+
+            result = scheduler.step(frame, now=frames / fps)
+            frame = tryon.annotate(frame, result, timer)
+            if on_frame is not None:
+                on_frame(frames, frame, result)
+
+            if output:
+                if writer is None:
+                    height, width = frame.shape[:2]
+                    writer = cv2.VideoWriter(output, cv2.VideoWriter_fourcc(*'mp4v'), fps, (width, height))
+                with timer.stage('encode'):
+                    writer.write(frame)
+
+            timer.frame_done()
+            frames += 1
+    finally:
+        scheduler.timer = NULL_TIMER
+        if writer is not None:
+            writer.release()
+    return frames
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Replay a recorded video or image directory through the try-on.')
+    parser.add_argument('input', help='Video file or directory of images.')
+    parser.add_argument('--output', help='Write the annotated frames to this video file.')
+    parser.add_argument('--fps', type=float, default=30.0, help='Frame rate assumed for image directories.')
+    parser.add_argument('--max-frames', type=int, help='Stop after this many frames.')
+    parser.add_argument('--timings', action='store_true', help='Print per-stage latency when done.')
+    parser.add_argument('--record', help='Stream the tracked landmarks of every frame into this file.')
+    tryon.add_scheduler_arguments(parser)
+    args = parser.parse_args()
+    tryon.configure_scheduler(args)
+
+    source = open_source(args.input, args.fps)
+    timer = StageTimer() if args.timings else NULL_TIMER
+    fps = source.get(cv2.CAP_PROP_FPS) or args.fps
+    recorder = None
+
+    def record(index, frame, result):
+        nonlocal recorder
+        if recorder is None:
+            recorder = LandmarkRecorder(args.record, frame.shape[1], frame.shape[0], fps)
+        recorder.write(result, index / fps)
+
+    try:
+        frames = replay(source, args.output, timer, args.max_frames, record if args.record else None)
+    finally:
+        source.release()
+        if recorder is not None:
+            recorder.close()
+
+    if args.timings:
+        print(format_summary(timer.summary()))
+    else:
+        print(f"Replayed {frames} frames.")
+
+
+if __name__ == '__main__':
+    main()
@@ -7,12 +7,31 @@ from kivy.uix.widget import Widget
 from kivy.uix.anchorlayout import AnchorLayout
 from kivy.uix.relativelayout import RelativeLayout
 from kivy.core.window import Window
+from kivy.clock import Clock
+import uuid
+
+from asset_cache import get_assets
+from reservation_store import CONFIRMED, SOLD_OUT, ReservationStore
+
+# Pre-launch products with the stock that can be pre-booked. Their images are sprites in the asset cache's product atlas.
+PRODUCTS = {
+    'black-glasses': 500,
+    'nail-art': 500,
+}
 
 class TryOnApp(App):
     def build(self):
+        # Every kiosk running this page books against the same local store
+        self.store = ReservationStore()
+        self.store.add_products(PRODUCTS)
+        # One reservation id per product, so tapping Pre-Book again cannot book a second item
+        self.reservation_ids = {}
+
         # Set the background image
         self.root = RelativeLayout()
-        background = Image(source='background.png', allow_stretch=True, keep_ratio=False)
+        # The background variant matched to the window, shared with the home page
+        background = Image(texture=get_assets().background(Window.size), allow_stretch=True, keep_ratio=False)
+        background.bind(size=lambda image, size: setattr(image, 'texture', get_assets().background(Window.size)))
         self.root.add_widget(background)
 
         # Main layout
@@ -26,23 +45,19 @@ class TryOnApp(App):
         # Main layout for products
         products_layout = BoxLayout(orientation='horizontal', spacing=10)
 
-        # Product 1
-        product1_layout = self.create_product_layout('blackglasses-removebg-preview (3).png')
-        products_layout.add_widget(product1_layout)
-
-        # Product 2
-        product2_layout = self.create_product_layout('nailback.png')
-        products_layout.add_widget(product2_layout)
+        # One layout per product
+        for product_id in PRODUCTS:
+            products_layout.add_widget(self.create_product_layout(product_id))
 
         root_layout.add_widget(products_layout)
 
         return self.root
 
-    def create_product_layout(self, image_path):
+    def create_product_layout(self, product_id):
         layout = RelativeLayout(size_hint=(1, 1))
 
-        # Adding an image
-        img = Image(source=image_path, size_hint=(None, None), size=(300, 400), pos_hint={'center_x': 0.5, 'center_y': 0.6})
+        # Adding an image, already sized for the widget and packed with the other products into one texture
+        img = Image(texture=get_assets().sprite(product_id), size_hint=(None, None), size=(300, 400), pos_hint={'center_x': 0.5, 'center_y': 0.6})
         layout.add_widget(img)
 
         # Creating a vertical box layout for the buttons
@@ -54,6 +69,7 @@ class TryOnApp(App):
 
         # Adding Pre-Book button
         prebook_button = Button(text='Pre-Book', size_hint=(None, None), size=(200, 50))
+        prebook_button.product_id = product_id
         prebook_button.bind(on_press=self.on_prebook_button_press)
 
         # Adding buttons to the button layout
@@ -69,7 +85,32 @@ class TryOnApp(App):
         print('VR Try-On clicked!')
 
     def on_prebook_button_press(self, instance):
-        print('Pre-Book clicked!')
+        product_id = instance.product_id
+        reservation_id = self.reservation_ids.setdefault(product_id, uuid.uuid4().hex)
+        instance.disabled = True
+        instance.text = 'Booking...'
+        future = self.store.reserve(product_id, reservation_id=reservation_id)
+        # The result arrives on the store's writer thread; widgets are only touched on the main thread
+        future.add_done_callback(lambda future: Clock.schedule_once(lambda dt: self.show_reservation(instance, future)))
+
+    # Function to show the outcome of a pre-booking on its button
+    def show_reservation(self, button, future):
+        if future.exception() is not None:
+            # Nothing was booked; the same reservation id is sent again on retry
+            button.disabled = False
+            button.text = 'Retry Pre-Book'
+            return
+        result = future.result()
+        if result.status == CONFIRMED:
+            button.text = 'Pre-Booked'
+        elif result.status == SOLD_OUT:
+            button.text = 'Sold Out'
+        else:
+            button.disabled = False
+            button.text = 'Pre-Book'
+
+    def on_stop(self):
+        self.store.close()
 
 if __name__ == '__main__':
     TryOnApp().run()
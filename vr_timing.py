@@ -0,0 +1,104 @@
+import time
+
+import numpy as np
+
+
+# Context manager timing one named stage with perf_counter_ns.
+class StageSpan:
+    __slots__ = ('timer', 'name', 'start')
+
+    def __init__(self, timer, name):
+        self.timer = timer
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.timer.record(self.name, time.perf_counter_ns() - self.start)
+        return False
+
+
+# Collects per-stage durations in nanoseconds.
+class StageTimer:
+    def __init__(self):
+        self.samples = {}
+        self.frames = 0
+        self.started_at = time.perf_counter_ns()
+
+    def stage(self, name):
+        return StageSpan(self, name)
+
+    def record(self, name, elapsed_ns):
+        samples = self.samples.get(name)
+        if samples is None:
+            samples = self.samples[name] = []
+        samples.append(elapsed_ns)
+
+    def frame_done(self):
+        self.frames += 1
+
+    def reset(self):
+        self.samples = {}
+        self.frames = 0
+        self.started_at = time.perf_counter_ns()
+
+    # Function to summarize each stage as count, mean and p50/p95/p99 in milliseconds.
+    def summary(self):
+        elapsed = (time.perf_counter_ns() - self.started_at) / 1e9
+        stages = {}
+        for name, samples in self.samples.items():
+            values = np.asarray(samples, dtype=np.float64) / 1e6
+            p50, p95, p99 = np.percentile(values, [50, 95, 99])
+            stages[name] = {
+                'count': len(values),
+                'mean_ms': float(values.mean()),
+                'p50_ms': float(p50),
+                'p95_ms': float(p95),
+                'p99_ms': float(p99),
+                'total_ms': float(values.sum()),
+            }
+        return {
+            'frames': self.frames,
+            'seconds': elapsed,
+            'fps': self.frames / elapsed if elapsed > 0 else 0.0,
+            'stages': stages,
+        }
+
+
+# Function to format a summary as a fixed-width table.
+def format_summary(summary):
+    lines = [f"{summary['frames']} frames in {summary['seconds']:.2f}s ({summary['fps']:.1f} fps)",
+             f"{'stage':<28}{'count':>8}{'mean':>10}{'p50':>10}{'p95':>10}{'p99':>10}"]
+    for name, stats in summary['stages'].items():
+        lines.append(f"{name:<28}{stats['count']:>8}{stats['mean_ms']:>10.3f}{stats['p50_ms']:>10.3f}"
+                     f"{stats['p95_ms']:>10.3f}{stats['p99_ms']:>10.3f}")
+    return '\n'.join(lines)
+
+
+# Stand-in timer used when nothing is being measured.
+class NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+class NullTimer:
+    span = NullSpan()
+
+    def stage(self, name):
+        return self.span
+
+    def record(self, name, elapsed_ns):
+        pass
+
+    def frame_done(self):
+        pass
+
+
+NULL_TIMER = NullTimer()